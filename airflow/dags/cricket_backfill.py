@@ -0,0 +1,184 @@
+"""
+Cricket Shot Detection - Re-scoring Backfill DAG
+When a new model version reaches Production, re-score the archived inputs
+with dynamically mapped, batched shard tasks
+"""
+from datetime import datetime, timedelta
+from airflow import DAG
+from airflow.models import Variable
+from airflow.operators.python import PythonOperator, ShortCircuitOperator
+import os
+import time
+import zlib
+import mlflow
+import registry_client  # shared with the Flask app (app/ is on PYTHONPATH)
+import bulk_score
+
+MODEL_NAME = os.getenv('MODEL_NAME', 'cricket_shot_detector')
+MODEL_STAGE = os.getenv('MODEL_STAGE', 'Production')
+ARCHIVE_SOURCE = os.getenv('BACKFILL_ARCHIVE_SOURCE', '/opt/airflow/archive/images')
+OUTPUT_DIR = os.getenv('BACKFILL_OUTPUT_DIR', '/opt/airflow/archive/predictions')
+NUM_SHARDS = int(os.getenv('BACKFILL_SHARDS', '16'))
+BATCH_SIZE = int(os.getenv('BACKFILL_BATCH_SIZE', '64'))
+LAST_VERSION_VARIABLE = 'cricket_backfill_last_scored_version'
+
+# Default arguments
+default_args = {
+    'owner': 'MuzammilAhmedBhatti',
+    'depends_on_past': False,
+    'start_date': datetime(2025, 12, 1),
+    'email_on_failure': False,
+    'email_on_retry': False,
+    'retries': 2,
+    'retry_delay': timedelta(minutes=5),
+}
+
+# DAG definition
+dag = DAG(
+    'cricket_shot_rescoring_backfill',
+    default_args=default_args,
+    description='Re-score archived inputs when a new model version is promoted',
+    schedule_interval='@hourly',
+    catchup=False,
+    max_active_runs=1,
+    tags=['mlops', 'cricket', 'backfill'],
+)
+
+
+def configure_mlflow():
+    """Point MLFlow at DagsHub using the shared registry client (once per process)"""
+    return registry_client.configure(
+        os.getenv('MLFLOW_TRACKING_URI'),
+        os.getenv('DAGSHUB_USERNAME'),
+        os.getenv('DAGSHUB_TOKEN'),
+    )
+
+
+def shard_of(key, num_shards=NUM_SHARDS):
+    """Stable shard assignment so retries and reruns see the same partition"""
+    return zlib.crc32(key.encode('utf-8')) % num_shards
+
+
+def shard_path(version, shard):
+    return os.path.join(OUTPUT_DIR, f"v{version}", f"shard-{shard:04d}.parquet")
+
+
+def detect_version_change():
+    """Return the Production version if it differs from the last fully re-scored one"""
+    current = configure_mlflow().stage_version(MODEL_NAME, MODEL_STAGE)
+    if current is None:
+        print(f"⚠️ No model in {MODEL_STAGE} stage, nothing to backfill")
+        return False
+    last = Variable.get(LAST_VERSION_VARIABLE, default_var=None)
+    print(f"🔍 {MODEL_NAME} {MODEL_STAGE} version: {current.version} (last re-scored: {last})")
+    if str(current.version) == str(last):
+        print("✅ Archive already scored with this version, skipping backfill")
+        return False
+    return str(current.version)
+
+
+def list_shards(**context):
+    """One mapped task per shard that has not been written for this version yet"""
+    version = context['ti'].xcom_pull(task_ids='detect_version_change')
+    shards = []
+    for shard in range(NUM_SHARDS):
+        if os.path.exists(shard_path(version, shard)):
+            print(f"⏭️ Shard {shard} already written for v{version}")
+            continue
+        shards.append({'version': version, 'shard': shard})
+    print(f"🧩 {len(shards)}/{NUM_SHARDS} shard(s) to score for v{version}")
+    return shards
+
+
+def score_shard(version, shard):
+    """Batched inference over one shard of the archive, written atomically"""
+    output = shard_path(version, shard)
+    if os.path.exists(output):
+        print(f"⏭️ {output} already exists")
+        return {'shard': shard, 'images': 0, 'seconds': 0.0, 'skipped': True}
+
+    configure_mlflow()
+    model = mlflow.keras.load_model(f"models:/{MODEL_NAME}/{version}")
+
+    started = time.time()
+    # Filter on the member name so other shards' images are never read or decoded here
+    items = bulk_score.iter_source(ARCHIVE_SOURCE, include=lambda key: shard_of(key) == shard)
+    rows = []
+    for batch in bulk_score.batched(items, BATCH_SIZE):
+        batch_rows, _ = bulk_score.score_rows(model, bulk_score.decode_batch(batch))
+        for row in batch_rows:
+            row['model_version'] = version
+        rows.extend(batch_rows)
+    seconds = time.time() - started
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    tmp = output + '.tmp'
+    # Same explicit schema as bulk_score parts; empty shards get a valid zero-row
+    # file so reruns skip them and pq.read_table('v<N>/') still works
+    bulk_score.write_parquet(tmp, rows, bulk_score.output_schema(extra_columns=['model_version']))
+    os.replace(tmp, output)
+
+    print(f"✅ Shard {shard}: {len(rows)} images in {seconds:.1f}s ({len(rows) / max(seconds, 1e-9):.1f} img/s)")
+    return {'shard': shard, 'images': len(rows), 'seconds': round(seconds, 2), 'skipped': False}
+
+
+def report_backfill(**context):
+    """Aggregate shard throughput, log it to MLFlow and mark the version as scored"""
+    version = context['ti'].xcom_pull(task_ids='detect_version_change')
+    shard_results = [r for r in context['ti'].xcom_pull(task_ids='score_shard') or [] if r]
+    missing = [s for s in range(NUM_SHARDS) if not os.path.exists(shard_path(version, s))]
+    if missing:
+        raise Exception(f"Shards not written for v{version}: {missing}")
+
+    images = sum(r['images'] for r in shard_results)
+    task_seconds = sum(r['seconds'] for r in shard_results)
+    wall_seconds = (datetime.now(context['dag_run'].start_date.tzinfo) - context['dag_run'].start_date).total_seconds()
+    print(f"📊 Re-scored {images} images for v{version} across {len(shard_results)} shard task(s)")
+    print(f"⏱️ Wall clock {wall_seconds:.0f}s, {images / max(wall_seconds, 1e-9):.1f} img/s overall, "
+          f"{images / max(task_seconds, 1e-9):.1f} img/s per task")
+
+    try:
+        configure_mlflow()
+        with mlflow.start_run(run_name="rescoring_backfill"):
+            mlflow.log_param("model_version", version)
+            mlflow.log_param("num_shards", NUM_SHARDS)
+            mlflow.log_metric("images_rescored", images)
+            mlflow.log_metric("wall_seconds", wall_seconds)
+            mlflow.log_metric("images_per_second", images / max(wall_seconds, 1e-9))
+    except Exception as e:
+        print(f"⚠️ Warning: Could not log backfill metrics: {str(e)}")
+
+    Variable.set(LAST_VERSION_VARIABLE, version)
+    return {'version': version, 'images': images, 'wall_seconds': wall_seconds}
+
+
+# Define tasks
+detect_version = ShortCircuitOperator(
+    task_id='detect_version_change',
+    python_callable=detect_version_change,
+    dag=dag,
+)
+
+plan_shards = PythonOperator(
+    task_id='list_shards',
+    python_callable=list_shards,
+    dag=dag,
+)
+
+# Dynamic task mapping: one score_shard instance per pending shard
+score_shards = PythonOperator.partial(
+    task_id='score_shard',
+    python_callable=score_shard,
+    dag=dag,
+).expand(op_kwargs=plan_shards.output)
+
+report = PythonOperator(
+    task_id='report_backfill',
+    python_callable=report_backfill,
+    # Still runs when every shard was already written (zero mapped instances)
+    trigger_rule='none_failed',
+    dag=dag,
+)
+
+# Define task dependencies
+detect_version >> plan_shards >> score_shards >> report
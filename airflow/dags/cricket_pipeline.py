@@ -9,7 +9,10 @@ from airflow.operators.bash import BashOperator
 import os
 import mlflow
 import dagshub
+import json
 import requests
+import registry_client  # shared with the Flask app (app/ is on PYTHONPATH)
+import monitoring
 
 # Default arguments
 default_args = {
@@ -33,8 +36,14 @@ dag = DAG(
 )
 
 
+_dagshub_initialized = False
+
+
 def initialize_dagshub():
-    """Initialize DagsHub connection"""
+    """Initialize DagsHub connection (once per worker process)"""
+    global _dagshub_initialized
+    if _dagshub_initialized:
+        return True
     try:
         dagshub_username = os.getenv('DAGSHUB_USERNAME')
         dagshub_repo = os.getenv('DAGSHUB_REPO')
@@ -51,12 +60,9 @@ def initialize_dagshub():
             mlflow=True
         )
         
-        # Set MLFlow tracking URI
-        mlflow.set_tracking_uri(mlflow_uri)
-        
-        # Set credentials
-        os.environ['MLFLOW_TRACKING_USERNAME'] = dagshub_username
-        os.environ['MLFLOW_TRACKING_PASSWORD'] = dagshub_token
+        # Set MLFlow tracking URI + credentials and create the shared registry client
+        registry_client.configure(mlflow_uri, dagshub_username, dagshub_token)
+        _dagshub_initialized = True
         
         print("✅ DagsHub initialized successfully")
         return True
@@ -76,16 +82,12 @@ def check_mlflow_connection():
         
         print(f"🔍 Checking for model: {model_name} (Stage: {model_stage})")
         
-        # Get MLFlow client
-        client = mlflow.tracking.MlflowClient()
-        
-        # Get model versions
-        versions = client.get_latest_versions(model_name, stages=[model_stage])
+        # Get model version in the requested stage (cached, retried)
+        latest_version = registry_client.get_client().stage_version(model_name, model_stage)
         
-        if not versions:
+        if latest_version is None:
             raise Exception(f"No model found in {model_stage} stage")
         
-        latest_version = versions[0]
         print(f"✅ Model found: Version {latest_version.version}")
         print(f"📅 Last updated: {latest_version.last_updated_timestamp}")
         print(f"🏷️ Run ID: {latest_version.run_id}")
@@ -180,6 +182,59 @@ def monitor_predictions():
         return False
 
 
+def check_drift():
+    """Compare the app's streaming monitoring sketches against the training baseline"""
+    try:
+        # Most recent closed windows only, so a fresh shift isn't diluted by older traffic
+        windows = int(os.getenv('DRIFT_WINDOWS', '12'))
+        flask_url = f"http://flask-app:5000/monitoring/snapshot?windows={windows}"
+        baseline_path = os.getenv('DRIFT_BASELINE_PATH', '/opt/airflow/dags/drift_baseline.json')
+        
+        print(f"📊 Fetching monitoring snapshot from {flask_url}")
+        response = requests.get(flask_url, timeout=10)
+        if response.status_code != 200:
+            raise Exception(f"Failed to get monitoring snapshot: {response.status_code}")
+        current = response.json()
+        
+        if not current.get('total'):
+            print("ℹ️ No predictions in the recent monitoring windows, skipping drift check")
+            return {'drifted': [], 'features': {}}
+        
+        if not os.path.exists(baseline_path):
+            print(f"⚠️ Warning: No drift baseline at {baseline_path}, skipping drift check")
+            return {'drifted': [], 'features': {}}
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        
+        report = monitoring.compare(baseline, current)
+        print(f"📈 PSI per feature (threshold {report['threshold']}):")
+        for name, value in sorted(report['features'].items()):
+            flag = "🚨" if name in report['drifted'] else "✅"
+            print(f"  {flag} {name}: {value}")
+        
+        if report['drifted']:
+            print(f"🚨 Drift detected in {len(report['drifted'])} feature(s): {', '.join(report['drifted'])}")
+        else:
+            print("✅ No drift detected")
+        
+        try:
+            initialize_dagshub()
+            with mlflow.start_run(run_name="drift_monitoring"):
+                mlflow.log_param("drifted_features", ",".join(report['drifted']) or "none")
+                mlflow.log_metric("drift_features_flagged", len(report['drifted']))
+                mlflow.log_metric("monitored_predictions", current['total'])
+                for name, value in report['features'].items():
+                    mlflow.log_metric(f"psi_{name.replace('.', '_')}", value)
+        except Exception as e:
+            print(f"⚠️ Warning: Could not log drift metrics: {str(e)}")
+        
+        return report
+        
+    except Exception as e:
+        print(f"⚠️ Warning: Could not check drift: {str(e)}")
+        return {'drifted': [], 'features': {}, 'error': str(e)}
+
+
 def log_pipeline_metrics():
     """Log pipeline execution metrics to MLFlow"""
     try:
@@ -240,6 +295,12 @@ monitor_preds = PythonOperator(
     dag=dag,
 )
 
+check_drift_task = PythonOperator(
+    task_id='check_drift',
+    python_callable=check_drift,
+    dag=dag,
+)
+
 log_metrics = PythonOperator(
     task_id='log_pipeline_metrics',
     python_callable=lambda: print("Logging pipeline metrics..."),
@@ -253,4 +314,4 @@ finish_pipeline = PythonOperator(
 )
 
 # Define task dependencies
-start_pipeline >> check_mlflow >> validate_model_task >> check_flask >> monitor_preds >> log_metrics >> finish_pipeline
+start_pipeline >> check_mlflow >> validate_model_task >> check_flask >> monitor_preds >> check_drift_task >> log_metrics >> finish_pipeline
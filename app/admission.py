@@ -0,0 +1,246 @@
+"""
+Admission control and load shedding for the inference endpoints.
+
+Keeps a bounded number of requests in flight, a bounded wait queue behind
+them, per-client token-bucket rate limits and a per-request deadline so
+work nobody is waiting for anymore is dropped before it reaches the model.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, jsonify, g
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# ---- Config (override via environment) ------------------------------------
+MAX_INFLIGHT = _env_int('ADMISSION_MAX_INFLIGHT', 4)
+MAX_QUEUE = _env_int('ADMISSION_MAX_QUEUE', 16)
+RATE_PER_SEC = _env_float('ADMISSION_RATE_PER_SEC', 5.0)
+BURST = _env_float('ADMISSION_BURST', 10.0)
+DEFAULT_TIMEOUT_MS = _env_int('ADMISSION_DEFAULT_TIMEOUT_MS', 30000)
+MAX_TRACKED_CLIENTS = _env_int('ADMISSION_MAX_TRACKED_CLIENTS', 10000)
+# Reverse proxies in front of the app (nginx-proxy-manager = 1). Only that many
+# X-Forwarded-For hops, counted from the right, are trusted (see app.py ProxyFix)
+TRUSTED_PROXIES = _env_int('ADMISSION_TRUSTED_PROXIES', 0)
+
+# Header carrying the client's remaining time budget in milliseconds
+DEADLINE_HEADER = 'X-Request-Timeout-Ms'
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/sec refill, capped at `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        """Consume one token; returns seconds to wait if none available (0 on success)."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate if self.rate > 0 else 1.0
+
+
+class AdmissionController:
+    """Bounded in-flight/queue limits, rate limits and shed/served counters."""
+
+    def __init__(self, max_inflight=MAX_INFLIGHT, max_queue=MAX_QUEUE,
+                 rate=RATE_PER_SEC, burst=BURST, max_clients=MAX_TRACKED_CLIENTS):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._queued = 0
+
+        self._buckets_lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'served': 0,
+            'shed_rate_limited': 0,
+            'shed_queue_full': 0,
+            'shed_queue_timeout': 0,
+            'shed_deadline': 0,
+        }
+
+    # ---- Rate limiting -----------------------------------------------------
+    def check_rate(self, client_id):
+        """Return 0 if the client may proceed, else suggested retry-after seconds."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._buckets_lock:
+            bucket = self._buckets.pop(client_id, None)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+            # Re-insert as most recently used; evict idle clients beyond the cap
+            self._buckets[client_id] = bucket
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return bucket.take(now)
+
+    # ---- Concurrency limiting ---------------------------------------------
+    def acquire(self, deadline):
+        """
+        Wait for an in-flight slot until `deadline` (monotonic seconds).
+        Returns None on success, or a shed reason string.
+        """
+        with self._cond:
+            if self._inflight < self.max_inflight:
+                self._inflight += 1
+                return None
+            if self._queued >= self.max_queue:
+                return 'shed_queue_full'
+            self._queued += 1
+            try:
+                while self._inflight >= self.max_inflight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return 'shed_queue_timeout'
+                    self._cond.wait(remaining)
+                self._inflight += 1
+                return None
+            finally:
+                self._queued -= 1
+
+    def try_acquire(self):
+        """Take an in-flight slot only if one is free right now (never queues)."""
+        with self._cond:
+            if self._inflight < self.max_inflight:
+                self._inflight += 1
+                return True
+            return False
+
+    def release(self):
+        with self._cond:
+            self._inflight -= 1
+            self._cond.notify()
+
+    # ---- Metrics -------------------------------------------------------------
+    def record(self, key):
+        with self._stats_lock:
+            self._stats[key] = self._stats.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        with self._cond:
+            stats['inflight'] = self._inflight
+            stats['queued'] = self._queued
+        stats['shed_total'] = sum(v for k, v in stats.items() if k.startswith('shed_') and k != 'shed_total')
+        stats['limits'] = {
+            'max_inflight': self.max_inflight,
+            'max_queue': self.max_queue,
+            'rate_per_sec': self.rate,
+            'burst': self.burst,
+            'default_timeout_ms': DEFAULT_TIMEOUT_MS,
+        }
+        return stats
+
+
+controller = AdmissionController()
+
+
+# ---- Request helpers ---------------------------------------------------------
+def client_id():
+    """Identify the caller for rate limiting.
+
+    Uses the peer address only: X-Forwarded-For is client-controlled, so it is
+    resolved by ProxyFix for the configured number of trusted proxies instead.
+    """
+    return request.remote_addr or 'unknown'
+
+
+def request_deadline():
+    """Monotonic deadline derived from the client's timeout header (or the default budget)."""
+    budget_ms = DEFAULT_TIMEOUT_MS
+    raw = request.headers.get(DEADLINE_HEADER)
+    if raw:
+        try:
+            budget_ms = max(0, min(int(float(raw)), DEFAULT_TIMEOUT_MS))
+        except ValueError:
+            pass
+    return time.monotonic() + budget_ms / 1000.0
+
+
+def deadline_expired():
+    """True if the current request's deadline has passed (call right before inference)."""
+    deadline = getattr(g, 'admission_deadline', None)
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def remaining_seconds():
+    """Seconds left on the current request's deadline (None outside an admitted request)."""
+    deadline = getattr(g, 'admission_deadline', None)
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def shed_response(reason, status, retry_after=None):
+    controller.record(reason)
+    resp = jsonify({'error': 'Server overloaded, request rejected', 'reason': reason})
+    resp.status_code = status
+    if retry_after is not None:
+        resp.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+    return resp
+
+
+def guard(view):
+    """Decorator: rate-limit, queue with a deadline, and count served vs shed requests."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        wait = controller.check_rate(client_id())
+        if wait > 0:
+            return shed_response('shed_rate_limited', 429, retry_after=wait)
+
+        deadline = request_deadline()
+        reason = controller.acquire(deadline)
+        if reason is not None:
+            return shed_response(reason, 503, retry_after=1)
+
+        g.admission_deadline = deadline
+        try:
+            result = view(*args, **kwargs)
+        finally:
+            controller.release()
+
+        status = result[1] if isinstance(result, tuple) and len(result) > 1 else getattr(result, 'status_code', 200)
+        if status == 503 and getattr(g, 'admission_shed', False):
+            controller.record('shed_deadline')
+        elif status < 400:
+            controller.record('served')
+        return result
+    return wrapper
+
+
+def deadline_response():
+    """Response for work dropped because the client's deadline passed while queued."""
+    g.admission_shed = True
+    return jsonify({'error': 'Request deadline exceeded before inference', 'reason': 'shed_deadline'}), 503
@@ -6,20 +6,37 @@ artifacts/model_files/cricket_shot_model.keras
 import os
 import traceback
 import numpy as np
-from flask import Flask, request, jsonify, render_template_string, render_template
+from flask import Flask, request, jsonify, render_template_string, render_template, Response
 from werkzeug.utils import secure_filename
-from PIL import Image
+from werkzeug.middleware.proxy_fix import ProxyFix
+from flask_sock import Sock
 import mlflow
 import tempfile
+import cpu_inference  # sets oneDNN/thread env vars, so it must come before TensorFlow
 import tensorflow as tf
-from mlflow import MlflowClient
+import registry_client
+import admission
+import preprocessing
+import embeddings
+import monitoring
+import profiling
+import live_feed
+import shadow
+import jobs
+import json
+import time
+import threading
 
 
 # ---- App config ------------------------------------------------------------
 app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = '/app/uploads'
+if admission.TRUSTED_PROXIES:
+    # remote_addr becomes the hop appended by our own proxy, not whatever the client sent
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=admission.TRUSTED_PROXIES)
+app.config['UPLOAD_FOLDER'] = os.getenv('UPLOAD_FOLDER', '/app/uploads')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+sock = Sock(app)
 
 # ============================================
 # MLflow Credentials (hardcoded for simplicity)
@@ -60,11 +77,22 @@ print(f"DEBUG: Setting MLflow tracking URI to {MLFLOW_TRACKING_URI}")
 log_debug(f"Setting MLFLOW_TRACKING_URI: {MLFLOW_TRACKING_URI}")
 mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
 
+# Optimized CPU mode: thread pools must be sized before the first TF op
+cpu_inference.configure_threads()
+
 # ============================================
 # Globals
 # ============================================
 model = None
-class_names = ["pullshot", "sweep", "legglance-flick", "drive"]
+class_names = preprocessing.class_names
+embedding_model = None
+vector_index = None
+EMBEDDING_INDEX_DIR = os.getenv('EMBEDDING_INDEX_DIR', '/app/embeddings')
+_embedding_lock = threading.Lock()
+monitor = monitoring.StreamMonitor()
+shadow_evaluator = shadow.ShadowEvaluator()
+job_manager = jobs.JobManager()
+JOB_BATCH_SIZE = 32
 
 print("=" * 60)
 print("🏏 Cricket Shot Detection App")
@@ -74,15 +102,9 @@ print("=" * 60)
 def get_latest_run_id():
     """Find the latest MLflow run (most recent start_time)."""
     log_debug("get_latest_run_id: entered function")
-    print("DEBUG: Searching MLflow for latest runs (mlflow.search_runs)...")
+    print("DEBUG: Searching MLflow for latest run (max_results=1, cached)...")
     try:
-        runs = mlflow.search_runs(order_by=["start_time DESC"])
-        log_debug("get_latest_run_id: mlflow.search_runs returned")
-        if runs is None or runs.empty:
-            log_debug("get_latest_run_id: no runs found (runs.empty)")
-            raise Exception("No runs found in MLFlow")
-        latest_run = runs.iloc[0]
-        run_id = latest_run.run_id
+        run_id = registry_client.get_client().latest_run_id()
         log_debug(f"Found latest run_id: {run_id}")
         print(f"DEBUG: Latest run id found: {run_id}")
         return run_id
@@ -180,6 +202,14 @@ def load_model():
     global model
     log_debug("load_model: entered function")
     try:
+        local_model_path = os.getenv('LOCAL_MODEL_PATH')
+        if local_model_path:
+            # Offline runs (benchmarks, local debugging) skip MLflow entirely
+            print(f"\n📦 Loading local model from {local_model_path}...")
+            model = tf.keras.models.load_model(local_model_path)
+            print(f"🎯 Model type: {type(model)}")
+            return True
+
         print("\n📦 Loading model from MLflow...")
         log_debug("load_model: trying Model Registry first")
         try:
@@ -218,10 +248,56 @@ def health():
     print("DEBUG: /health requested")
     return jsonify({
         'status': 'healthy',
-        'model_loaded': model is not None
+        'model_loaded': model is not None,
+        'inference': cpu_inference.describe()
     })
 
+def record_monitoring(img_batch, probs):
+    """Feed drift/confidence sketches; never let monitoring break a prediction."""
+    try:
+        monitor.record(img_batch, probs)
+    except Exception as e:
+        log_debug(f"record_monitoring: failed: {e}")
+
+@app.route('/monitoring/snapshot')
+def monitoring_snapshot():
+    """Windowed streaming sketches: ?windows=N merges the newest N closed windows, ?window=current is the open one"""
+    log_debug("monitoring_snapshot: endpoint called")
+    if request.args.get('window') == 'current':
+        return jsonify(monitor.to_dict())
+    try:
+        windows = max(1, min(int(request.args.get('windows', 1)), monitor.windows.maxlen))
+    except ValueError:
+        return jsonify({'error': 'windows must be an integer'}), 400
+    return jsonify(monitor.recent(windows))
+
+@app.route('/shadow/stats')
+def shadow_stats():
+    """Candidate-vs-production agreement, confidence deltas and candidate latency"""
+    log_debug("shadow_stats: endpoint called")
+    return jsonify(shadow_evaluator.stats())
+
+@app.route('/admission/stats')
+def admission_stats():
+    """Admission control metrics: served vs shed requests, current in-flight/queued"""
+    log_debug("admission_stats: endpoint called")
+    return jsonify(admission.controller.snapshot())
+
+@app.route('/admin/traces')
+def admin_traces():
+    """List recent profiling traces (X-Admin-Token required if ADMIN_TOKEN is set)"""
+    log_debug("admin_traces: endpoint called")
+    return profiling.list_traces()
+
+@app.route('/admin/traces/<trace_id>')
+def admin_trace_download(trace_id):
+    """Download one profiling trace as a zip"""
+    log_debug(f"admin_trace_download: {trace_id}")
+    return profiling.download_trace(trace_id)
+
 @app.route('/predict', methods=['POST'])
+@admission.guard
+@profiling.profiled
 def predict():
     """Prediction endpoint"""
     log_debug("predict: endpoint called")
@@ -243,6 +319,10 @@ def predict():
             print("DEBUG: Uploaded file has empty filename")
             return jsonify({'error': 'No file selected'}), 400
 
+        # Validate format/dimensions from the header before touching disk or decoding
+        image_format, image_size = preprocessing.probe(file.stream)
+        log_debug(f"predict: probed {image_format} {image_size[0]}x{image_size[1]}")
+
         # Save and process image
         filename = secure_filename(file.filename)
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
@@ -254,21 +334,32 @@ def predict():
         # Preprocess
         log_debug("predict: opening image and preprocessing")
         print("DEBUG: Starting image preprocessing")
-        img = Image.open(filepath).convert('RGB')
+        img = preprocessing.load_rgb(filepath)
         log_debug("predict: image converted to RGB")
-        img = img.resize((224, 224))
-        log_debug("predict: image resized to (224,224)")
-        img_array = np.array(img)
+        img_array = preprocessing.to_array(img)
+        log_debug(f"predict: image resized to {preprocessing.IMAGE_SIZE}")
         log_debug(f"predict: image converted to numpy array with shape {img_array.shape}")
         img_array = np.expand_dims(img_array, axis=0)
         log_debug(f"predict: image array expanded to shape {img_array.shape}")
 
+        # Drop work whose client has already given up
+        if admission.deadline_expired():
+            log_debug(f"predict: deadline exceeded before inference for {filename}, dropping")
+            try:
+                os.remove(filepath)
+            except Exception:
+                pass
+            return admission.deadline_response()
+
         # Predict
         log_debug(f"Making prediction for: {filename}")
         print(f"DEBUG: Calling model.predict for file {filename}")
         # If the loaded model is an mlflow pyfunc wrapper it expects different input; but we loaded a Keras model
-        predictions = model.predict(img_array, verbose=0)[0]
+        with profiling.tf_trace():
+            predictions = model.predict(img_array, verbose=0)[0]
         log_debug(f"predict: raw predictions: {predictions}")
+        record_monitoring(img_array, predictions)
+        shadow_evaluator.submit(img_array, predictions)
         predicted_idx = int(np.argmax(predictions))
         confidence = float(predictions[predicted_idx] * 100)
         predicted_class = class_names[predicted_idx]
@@ -290,12 +381,381 @@ def predict():
             'confidence': round(confidence, 2)
         })
 
+    except preprocessing.ImageRejected as e:
+        log_debug(f"predict: image rejected before decode: {e}")
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
         log_debug(f"❌ Prediction error: {str(e)}")
         print(f"DEBUG: predict exception: {e}")
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/predict/raw', methods=['POST'])
+@admission.guard
+@profiling.profiled
+def predict_raw():
+    """
+    Binary prediction endpoint for pre-resized frames: body is a .npy file
+    (Content-Type: application/x-npy) or raw concatenated 224x224x3 uint8 frames
+    (application/octet-stream). Send Accept: application/octet-stream to get
+    float32 N x len(class_names) probabilities back instead of JSON.
+    """
+    log_debug("predict_raw: endpoint called")
+    try:
+        if model is None:
+            return jsonify({'error': 'Model not loaded'}), 500
+
+        batch = preprocessing.tensor_from_payload(request.get_data(cache=False), request.content_type)
+        log_debug(f"predict_raw: received batch with shape {batch.shape}")
+
+        if admission.deadline_expired():
+            return admission.deadline_response()
+
+        with profiling.tf_trace():
+            probs = model.predict(batch, verbose=0)
+        record_monitoring(batch, probs)
+        shadow_evaluator.submit(batch, probs)
+
+        if request.accept_mimetypes.best == 'application/octet-stream':
+            response = app.response_class(np.ascontiguousarray(probs, dtype=np.float32).tobytes(),
+                                          mimetype='application/octet-stream')
+            response.headers['X-Tensor-Shape'] = f"{probs.shape[0]},{probs.shape[1]}"
+            response.headers['X-Class-Names'] = ','.join(class_names)
+            return response
+
+        results = []
+        for row in probs:
+            predicted_class, confidence = preprocessing.top_prediction(row)
+            results.append({'prediction': predicted_class, 'confidence': round(confidence, 2)})
+        return jsonify({'predictions': results})
+
+    except preprocessing.ImageRejected as e:
+        log_debug(f"predict_raw: payload rejected: {e}")
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        log_debug(f"❌ Raw prediction error: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+# ---------------- Live feed (WebSocket) ----------------------------------------
+def predict_live_batch(batch):
+    """Model call used by live-feed sessions; shares the admission in-flight bound with HTTP."""
+    if model is None:
+        raise RuntimeError('Model not loaded')
+    # Never queue a live frame: a newer one will arrive soon, so drop this one when busy
+    if not admission.controller.try_acquire():
+        admission.controller.record('shed_live_frame')
+        raise live_feed.FrameDropped()
+    try:
+        probs = model.predict(batch, verbose=0)
+    finally:
+        admission.controller.release()
+    record_monitoring(batch, probs)
+    return probs
+
+@sock.route('/ws/live')
+def live(ws):
+    """Live camera/broadcast classification; newest frame wins, stale frames are dropped (?smooth=0.6)"""
+    log_debug("live: websocket connected")
+    try:
+        smooth = min(max(float(request.args.get('smooth', 0)), 0.0), 0.99)
+    except ValueError:
+        smooth = 0.0
+    live_feed.serve(ws, predict_live_batch, smooth)
+    log_debug("live: websocket closed")
+
+# ---------------- Background jobs ----------------------------------------------
+def predict_job_batch(batch):
+    """Model call used by background jobs."""
+    if model is None:
+        raise RuntimeError('Model not loaded')
+    probs = model.predict(np.stack(batch), verbose=0)
+    record_monitoring(np.stack(batch), probs)
+    return probs
+
+def run_batch_predict_job(job, ctx):
+    """Classify every uploaded image in the job directory."""
+    names = sorted(os.listdir(ctx.input_dir))
+    results = []
+    for start in range(0, len(names), JOB_BATCH_SIZE):
+        if ctx.cancelled():
+            break
+        chunk, arrays = [], []
+        for name in names[start:start + JOB_BATCH_SIZE]:
+            try:
+                arrays.append(preprocessing.preprocess(os.path.join(ctx.input_dir, name)))
+                chunk.append(name)
+            except Exception as e:
+                results.append({'file': name, 'error': str(e)})
+        if arrays:
+            for name, probs in zip(chunk, predict_job_batch(arrays)):
+                predicted_class, confidence = preprocessing.top_prediction(probs)
+                results.append({'file': name, 'prediction': predicted_class, 'confidence': round(confidence, 2)})
+        ctx.progress(min(start + JOB_BATCH_SIZE, len(names)) / max(len(names), 1))
+    return {'predictions': results}
+
+def validate_video_params(params):
+    """Error message for bad video job params, or None."""
+    value = params.get('frames_per_second', 2)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 < value <= 120:
+        return 'frames_per_second must be a number in (0, 120]'
+    return None
+
+def unique_upload_names(uploads):
+    """Map sanitised filenames to uploads; repeated names get -1, -2, ... instead of overwriting."""
+    files = {}
+    for upload in uploads:
+        if not upload.filename:
+            continue
+        name = secure_filename(upload.filename) or 'upload'
+        stem, ext = os.path.splitext(name)
+        candidate, n = name, 1
+        while candidate in files:
+            candidate = f"{stem}-{n}{ext}"
+            n += 1
+        files[candidate] = upload
+    return files
+
+JOB_PARAM_VALIDATORS = {'video': validate_video_params}
+
+def run_video_job(job, ctx):
+    """Classify sampled frames of an uploaded video (params: frames_per_second, default 2)."""
+    import cv2
+    names = sorted(os.listdir(ctx.input_dir))
+    if not names:
+        raise ValueError('No video uploaded')
+    capture = cv2.VideoCapture(os.path.join(ctx.input_dir, names[0]))
+    if not capture.isOpened():
+        raise ValueError(f'Could not open video {names[0]}')
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    total_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) or 0
+    error = validate_video_params(job['params'])
+    if error:
+        raise ValueError(error)
+    stride = max(1, int(round(fps / float(job['params'].get('frames_per_second', 2)))))
+
+    timeline, pending, pending_index = [], [], []
+    counts = dict.fromkeys(class_names, 0)
+
+    def flush():
+        for index, probs in zip(pending_index, predict_job_batch(pending)):
+            predicted_class, confidence = preprocessing.top_prediction(probs)
+            counts[predicted_class] += 1
+            timeline.append({'frame': index, 'time_s': round(index / fps, 3),
+                             'prediction': predicted_class, 'confidence': round(confidence, 2)})
+        pending.clear()
+        pending_index.clear()
+
+    index = 0
+    try:
+        while not ctx.cancelled():
+            ok = capture.grab()
+            if not ok:
+                break
+            if index % stride == 0:
+                ok, frame = capture.retrieve()
+                if ok:
+                    rgb = cv2.cvtColor(cv2.resize(frame, preprocessing.IMAGE_SIZE), cv2.COLOR_BGR2RGB)
+                    pending.append(rgb)
+                    pending_index.append(index)
+                if len(pending) >= JOB_BATCH_SIZE:
+                    flush()
+                    if total_frames:
+                        ctx.progress(index / total_frames)
+            index += 1
+        if pending:
+            flush()
+    finally:
+        capture.release()
+    dominant = max(counts, key=counts.get) if timeline else None
+    return {'video': names[0], 'fps': fps, 'frames': index, 'sampled': len(timeline),
+            'dominant_shot': dominant, 'counts': counts, 'timeline': timeline}
+
+job_manager.register('batch_predict', run_batch_predict_job)
+job_manager.register('video', run_video_job)
+
+@app.route('/jobs', methods=['POST'])
+@admission.guard
+def submit_job():
+    """Queue a long-running job; returns 202 with the job id immediately"""
+    log_debug("submit_job: endpoint called")
+    # Videos are much larger than the 16 MB single-image cap; must be set before the body is parsed
+    request.max_content_length = jobs.JOBS_MAX_UPLOAD_BYTES
+    kind = request.form.get('kind', 'batch_predict')
+    if kind not in job_manager.handlers:
+        return jsonify({'error': f'Unknown job kind: {kind}', 'kinds': sorted(job_manager.handlers)}), 400
+    uploads = request.files.getlist('files') or request.files.getlist('file')
+    files = unique_upload_names(uploads)
+    if not files:
+        return jsonify({'error': 'No files provided'}), 400
+    try:
+        priority = int(request.form.get('priority', 0))
+        params = json.loads(request.form.get('params', '{}'))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid priority/params: {e}'}), 400
+    if not isinstance(params, dict):
+        return jsonify({'error': 'params must be a JSON object'}), 400
+    validator = JOB_PARAM_VALIDATORS.get(kind)
+    error = validator(params) if validator else None
+    if error:
+        return jsonify({'error': error}), 400
+    job_id = job_manager.submit(kind, params=params, priority=priority, files=files)
+    log_debug(f"submit_job: queued {kind} job {job_id} with {len(files)} file(s)")
+    return jsonify({'job_id': job_id, 'status': jobs.QUEUED, 'status_url': f'/jobs/{job_id}'}), 202
+
+@app.route('/jobs')
+def list_jobs():
+    """Recent jobs (?status=queued|running|succeeded|failed|cancelled&limit=50, limit 1..500)"""
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    return jsonify({'jobs': job_manager.list_jobs(limit=limit, status=request.args.get('status'))})
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Job status, progress and (when finished) result"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued job or ask a running one to stop"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    log_debug(f"cancel_job: {job_id} -> {job['status']}")
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Server-sent events stream of status/progress until the job finishes"""
+    if job_manager.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def stream():
+        last = None
+        while True:
+            job = job_manager.get(job_id)
+            if job is None:
+                return
+            state = (job['status'], job['progress'])
+            if state != last:
+                last = state
+                yield f"data: {json.dumps(job)}\n\n"
+            if job['status'] in jobs.TERMINAL:
+                return
+            time.sleep(0.5)
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+# ---------------- Embeddings & similarity search ------------------------------
+def get_embedding_model():
+    """Build (once) the penultimate-layer embedding model from the loaded classifier."""
+    global embedding_model
+    with _embedding_lock:
+        if embedding_model is None:
+            log_debug("get_embedding_model: building embedding model from classifier")
+            embedding_model = cpu_inference.optimize(embeddings.build_embedding_model(model))
+        return embedding_model
+
+def get_vector_index():
+    """Open (once) the on-disk vector index of archived shot embeddings."""
+    global vector_index
+    with _embedding_lock:
+        if vector_index is None:
+            log_debug(f"get_vector_index: opening index at {EMBEDDING_INDEX_DIR}")
+            vector_index = embeddings.VectorIndex(EMBEDDING_INDEX_DIR)
+        return vector_index
+
+def embed_upload():
+    """Read the uploaded file and return (embedding, predicted_class, confidence) or an error response."""
+    if model is None:
+        return None, (jsonify({'error': 'Model not loaded'}), 500)
+    file = request.files.get('file')
+    if file is None or file.filename == '':
+        return None, (jsonify({'error': 'No file provided'}), 400)
+    img_array = preprocessing.preprocess(file.stream)
+    if admission.deadline_expired():
+        return None, admission.deadline_response()
+    batch = np.expand_dims(img_array, axis=0)
+    with profiling.tf_trace():
+        vectors, probs = get_embedding_model().predict(batch, verbose=0)
+    record_monitoring(batch, probs)
+    predicted_class, confidence = preprocessing.top_prediction(probs[0])
+    return (vectors[0], predicted_class, confidence), None
+
+@app.route('/embed', methods=['POST'])
+@admission.guard
+@profiling.profiled
+def embed():
+    """Return the shot embedding; with ?add=1 (admin only) also insert it into the archive index under ?id="""
+    log_debug("embed: endpoint called")
+    add = request.args.get('add') in ('1', 'true', 'yes')
+    # Index writes need a configured ADMIN_TOKEN; bulk_score.py --index-dir is the normal way in
+    if add and not profiling.admin_authorized(require_token=True):
+        return jsonify({'error': 'Adding to the index requires a valid X-Admin-Token (ADMIN_TOKEN must be set)'}), 403
+    try:
+        result, error = embed_upload()
+        if error is not None:
+            return error
+        vector, predicted_class, confidence = result
+        response = {
+            'embedding': [round(float(v), 6) for v in vector],
+            'dim': int(vector.shape[0]),
+            'prediction': predicted_class,
+            'confidence': round(confidence, 2),
+        }
+        if add:
+            shot_id = request.args.get('id') or secure_filename(request.files['file'].filename)
+            meta = {'id': shot_id, 'prediction': predicted_class, 'confidence': round(confidence, 2)}
+            response['index_count'] = get_vector_index().add(vector, [meta])
+            log_debug(f"embed: added {shot_id} to index (count={response['index_count']})")
+        return jsonify(response)
+    except preprocessing.ImageRejected as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        log_debug(f"❌ Embedding error: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/similar', methods=['POST'])
+@admission.guard
+@profiling.profiled
+def similar():
+    """Top-k archived shots most similar to the uploaded image (?k=10)"""
+    log_debug("similar: endpoint called")
+    try:
+        k = max(1, min(int(request.args.get('k', 10)), 100))
+    except ValueError:
+        return jsonify({'error': 'k must be an integer'}), 400
+    try:
+        result, error = embed_upload()
+        if error is not None:
+            return error
+        vector, predicted_class, confidence = result
+        matches = get_vector_index().search(vector, k=k)
+        log_debug(f"similar: returning {len(matches)} matches")
+        return jsonify({
+            'prediction': predicted_class,
+            'confidence': round(confidence, 2),
+            'results': matches,
+        })
+    except preprocessing.ImageRejected as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        log_debug(f"❌ Similarity search error: {str(e)}")
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/index/stats')
+def index_stats():
+    """Size and dimensionality of the archived embedding index"""
+    log_debug("index_stats: endpoint called")
+    return jsonify(get_vector_index().stats())
+
 # ---------------- Home page HTML (unchanged) ----------------------------------
 HOME_HTML = '''
 <!DOCTYPE html>
@@ -397,6 +857,21 @@ HOME_HTML = '''
             0%, 100% { opacity: 1; }
             50% { opacity: 0.5; }
         }
+        .live-feed {
+            margin: 20px 0;
+            text-align: center;
+        }
+        .live-feed video {
+            width: 100%;
+            max-width: 400px;
+            border-radius: 10px;
+            display: none;
+            margin: 15px auto;
+        }
+        .live-stats {
+            color: #888;
+            font-size: 13px;
+        }
         .error {
             background: #fef2f2 !important;
             border-left-color: #ef4444 !important;
@@ -416,6 +891,12 @@ HOME_HTML = '''
             <button onclick="uploadImage()">🎯 Detect Shot</button>
         </div>
 
+        <div class="live-feed">
+            <button id="liveButton" onclick="toggleLive()">📹 Live Camera</button>
+            <video id="liveVideo" autoplay muted playsinline></video>
+            <p class="live-stats" id="liveStats"></p>
+        </div>
+
         <div id="result"></div>
     </div>
 
@@ -459,6 +940,61 @@ HOME_HTML = '''
             });
         }
 
+        // Live camera feed over WebSocket: the server classifies the newest frame and drops stale ones
+        let liveSocket = null, liveStream = null, liveTimer = null;
+        const liveCanvas = document.createElement('canvas');
+        liveCanvas.width = 224;
+        liveCanvas.height = 224;
+
+        function stopLive() {
+            clearInterval(liveTimer);
+            if (liveSocket) liveSocket.close();
+            if (liveStream) liveStream.getTracks().forEach(t => t.stop());
+            liveSocket = liveStream = null;
+            document.getElementById('liveVideo').style.display = 'none';
+            document.getElementById('liveButton').textContent = '📹 Live Camera';
+        }
+
+        async function toggleLive() {
+            if (liveSocket) { stopLive(); return; }
+            const video = document.getElementById('liveVideo');
+            const resultDiv = document.getElementById('result');
+            try {
+                liveStream = await navigator.mediaDevices.getUserMedia({ video: true });
+            } catch (error) {
+                alert('Camera not available: ' + error);
+                return;
+            }
+            video.srcObject = liveStream;
+            video.style.display = 'block';
+            document.getElementById('liveButton').textContent = '⏹️ Stop Live';
+
+            const scheme = location.protocol === 'https:' ? 'wss' : 'ws';
+            liveSocket = new WebSocket(`${scheme}://${location.host}/ws/live?smooth=0.6`);
+            liveSocket.binaryType = 'arraybuffer';
+            liveSocket.onmessage = (event) => {
+                const data = JSON.parse(event.data);
+                if (data.type !== 'prediction') return;
+                resultDiv.style.display = 'block';
+                resultDiv.className = '';
+                resultDiv.innerHTML = `
+                    <p class="prediction">${data.prediction.replace('-', ' ')}</p>
+                    <p class="confidence">Confidence: ${data.confidence}%</p>
+                `;
+                const s = data.stats;
+                document.getElementById('liveStats').textContent =
+                    `${s.processed_fps} fps · ${data.latency_ms} ms · dropped ${s.dropped}/${s.received}`;
+            };
+            liveSocket.onclose = stopLive;
+            liveTimer = setInterval(() => {
+                if (!liveSocket || liveSocket.readyState !== WebSocket.OPEN) return;
+                liveCanvas.getContext('2d').drawImage(video, 0, 0, 224, 224);
+                liveCanvas.toBlob(blob => {
+                    if (blob && liveSocket) liveSocket.send(blob);
+                }, 'image/jpeg', 0.8);
+            }, 100);
+        }
+
         // Allow drag and drop
         const uploadForm = document.querySelector('.upload-form');
         uploadForm.addEventListener('dragover', (e) => {
@@ -531,6 +1067,16 @@ log_debug(f"MLFlow URI: {MLFLOW_TRACKING_URI}")
 log_debug(f"Username: {MLFLOW_USERNAME}")
 print("\n🔄 Loading model from MLflow...")
 model_loaded = load_model()
+if model_loaded and cpu_inference.enabled():
+    log_debug(f"Startup: wrapping model for optimized CPU inference ({cpu_inference.mode_label()})")
+    model = cpu_inference.optimize(model)
+if model_loaded:
+    # Build (and in optimized mode compile/warm up) the embedding model now rather than
+    # inside the first /embed or /similar request while _embedding_lock is held
+    try:
+        get_embedding_model()
+    except Exception as e:
+        log_debug(f"Startup: embedding model unavailable: {e}")
 
 if model_loaded:
     print("\n✅ All systems ready!")
@@ -543,6 +1089,9 @@ else:
     log_debug("Startup: model failed to load; server will still run but /predict will return model not loaded")
 
 if __name__ == '__main__':
+    # Only the server runs jobs; importers such as bulk_score.py must not recover or claim them
+    log_debug("Starting background job workers")
+    job_manager.start()
     log_debug("Starting Flask app via app.run")
     print("DEBUG: Calling app.run(host='0.0.0.0', port=5000)")
     app.run(host='0.0.0.0', port=5000)
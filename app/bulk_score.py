@@ -0,0 +1,310 @@
+"""
+Offline bulk scorer for historical footage.
+
+Streams images from a directory, .tar(.gz) or .zip archive, decodes them in a
+process pool, runs batched inference and writes results incrementally as
+Parquet (or CSV) part files. Progress is checkpointed after every part so an
+interrupted job resumes where it stopped.
+
+Usage:
+    python bulk_score.py SOURCE OUTPUT_DIR [--format parquet|csv]
+        [--batch-size 64] [--workers N] [--rows-per-part 10000]
+        [--model-path model.keras] [--index-dir embeddings/]
+
+Without --model-path the model is loaded from MLflow exactly like the app does.
+With --index-dir the penultimate-layer embeddings are also appended to a
+vector index (see embeddings.py) for similarity search.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import tarfile
+import zipfile
+import argparse
+import traceback
+import multiprocessing as mp
+from collections import deque
+from itertools import islice
+
+import numpy as np
+
+import preprocessing
+import embeddings
+import cpu_inference  # before TensorFlow is imported anywhere
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+CHECKPOINT_FILE = '_checkpoint.json'
+COLUMNS = ['path', 'prediction', 'confidence'] + [f'prob_{c}' for c in preprocessing.class_names] + ['error']
+
+
+# ---- Sources -----------------------------------------------------------------
+def _is_image(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def iter_directory(root, skip=0, include=None):
+    """Yield (relative_path, absolute_path) in a stable order; workers read the file."""
+    index = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if not _is_image(name):
+                continue
+            full = os.path.join(dirpath, name)
+            key = os.path.relpath(full, root)
+            if include is not None and not include(key):
+                continue
+            index += 1
+            if index <= skip:
+                continue
+            yield key, full
+
+
+def iter_tar(path, skip=0, include=None):
+    """Stream members of a (possibly compressed) tar without random access."""
+    index = 0
+    with tarfile.open(path, 'r|*') as archive:
+        for member in archive:
+            if not member.isfile() or not _is_image(member.name):
+                continue
+            if include is not None and not include(member.name):
+                continue  # filtered on the header, before the member's data is read
+            index += 1
+            if index <= skip:
+                continue  # unread member data is skipped by the stream
+            handle = archive.extractfile(member)
+            yield member.name, handle.read()
+
+
+def iter_zip(path, skip=0, include=None):
+    """Yield zip entries one at a time (only the current entry is held in memory)."""
+    index = 0
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not _is_image(info.filename):
+                continue
+            if include is not None and not include(info.filename):
+                continue
+            index += 1
+            if index <= skip:
+                continue
+            yield info.filename, archive.read(info)
+
+
+def iter_source(source, skip=0, include=None):
+    """Dispatch on the source type; `include(key) -> bool` filters by name before anything is read."""
+    if os.path.isdir(source):
+        return iter_directory(source, skip, include)
+    if zipfile.is_zipfile(source):
+        return iter_zip(source, skip, include)
+    if tarfile.is_tarfile(source):
+        return iter_tar(source, skip, include)
+    raise ValueError(f"Unsupported source (expected directory, tar or zip): {source}")
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ---- Worker ----------------------------------------------------------------------
+def decode_batch(items):
+    """Runs in a worker process: (key, path-or-bytes) -> (key, array or None, error)."""
+    decoded = []
+    for key, payload in items:
+        try:
+            decoded.append((key, preprocessing.preprocess(payload), None))
+        except Exception as e:
+            decoded.append((key, None, str(e)))
+    return decoded
+
+
+# ---- Output ----------------------------------------------------------------------
+def read_checkpoint(output_dir):
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return {'processed': 0, 'parts': 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_checkpoint(output_dir, state):
+    path = os.path.join(output_dir, CHECKPOINT_FILE)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def output_schema(extra_columns=()):
+    """One explicit Arrow schema for every part, so all-error or error-free parts
+    don't get null-typed columns and a directory of parts reads as one dataset."""
+    import pyarrow as pa
+    fields = [('path', pa.string()), ('prediction', pa.string()), ('confidence', pa.float64())]
+    fields += [(f'prob_{c}', pa.float64()) for c in preprocessing.class_names]
+    fields += [('error', pa.string())] + [(col, pa.string()) for col in extra_columns]
+    return pa.schema(fields)
+
+
+def write_parquet(path, rows, schema):
+    """Rows -> parquet with a fixed schema (empty row lists still get a valid file)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    pq.write_table(pa.Table.from_pylist(rows, schema=schema), path)
+
+
+def write_part(output_dir, part_index, rows, fmt):
+    """Write one part atomically (tmp + rename) so a crash never leaves a half file."""
+    path = os.path.join(output_dir, f'part-{part_index:05d}.{fmt}')
+    tmp = path + '.tmp'
+    if fmt == 'parquet':
+        write_parquet(tmp, rows, output_schema())
+    else:
+        with open(tmp, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+    os.replace(tmp, path)
+    return path
+
+
+# ---- Model -----------------------------------------------------------------------
+def load_scoring_model(model_path=None):
+    """Local Keras file if given, otherwise the app's MLflow loading path."""
+    if model_path:
+        import tensorflow as tf
+        cpu_inference.configure_threads()
+        print(f"📦 Loading local model from {model_path}")
+        return cpu_inference.optimize(tf.keras.models.load_model(model_path))
+    import app as cricket_app
+    if cricket_app.model is None:
+        raise RuntimeError("App failed to load a model from MLflow")
+    return cricket_app.model
+
+
+def score_rows(model, decoded, with_embeddings=False):
+    """Score decoded images; returns (rows, [(key, embedding), ...])."""
+    rows = []
+    vectors = []
+    valid = [(key, arr) for key, arr, err in decoded if err is None]
+    probs = []
+    if valid:
+        outputs = model.predict(np.stack([arr for _, arr in valid]), verbose=0)
+        if with_embeddings:
+            embedded, probs = outputs
+            vectors = [(key, vec) for (key, _), vec in zip(valid, embedded)]
+        else:
+            probs = outputs
+    prob_by_key = {key: p for (key, _), p in zip(valid, probs)}
+    for key, _, err in decoded:
+        row = {'path': key, 'prediction': None, 'confidence': None, 'error': err}
+        for c in preprocessing.class_names:
+            row[f'prob_{c}'] = None
+        if err is None:
+            p = prob_by_key[key]
+            row['prediction'], confidence = preprocessing.top_prediction(p)
+            row['confidence'] = round(confidence, 4)
+            for c, v in zip(preprocessing.class_names, p):
+                row[f'prob_{c}'] = float(v)
+        rows.append(row)
+    return rows, vectors
+
+
+# ---- Main loop -----------------------------------------------------------------
+def run(args):
+    os.makedirs(args.output_dir, exist_ok=True)
+    state = read_checkpoint(args.output_dir)
+    if state.get('source') not in (None, os.path.abspath(args.source)):
+        raise SystemExit(f"❌ {args.output_dir} holds a checkpoint for a different source: {state['source']}")
+    state['source'] = os.path.abspath(args.source)
+    if state['processed']:
+        print(f"🔁 Resuming after {state['processed']} images ({state['parts']} parts written)")
+
+    # Start workers before TensorFlow is imported in this process
+    pool = mp.get_context('spawn').Pool(args.workers)
+    try:
+        model = load_scoring_model(args.model_path)
+        index = None
+        if args.index_dir:
+            model = cpu_inference.optimize(embeddings.build_embedding_model(model))
+            index = embeddings.VectorIndex(args.index_dir)
+            print(f"🧭 Appending embeddings to index at {args.index_dir} ({index.count} existing)")
+
+        pending = deque()
+        buffer = []
+        vector_buffer = []
+        started = time.time()
+        scored = 0
+
+        def flush():
+            nonlocal buffer, vector_buffer
+            if not buffer:
+                return
+            # Added before the part/checkpoint: if we die in between, the resumed run
+            # re-adds this part and VectorIndex skips ids it already holds
+            if index is not None and vector_buffer:
+                index.add(np.stack([vec for _, vec in vector_buffer]),
+                          [{'id': row['path'], 'prediction': row['prediction'], 'confidence': row['confidence']}
+                           for row in buffer if row['error'] is None])
+            path = write_part(args.output_dir, state['parts'], buffer, args.format)
+            state['parts'] += 1
+            state['processed'] += len(buffer)
+            write_checkpoint(args.output_dir, state)
+            rate = scored / max(time.time() - started, 1e-9)
+            print(f"💾 {path}: total {state['processed']} images ({rate:.1f} img/s)", flush=True)
+            buffer = []
+            vector_buffer = []
+
+        def drain_one():
+            nonlocal scored
+            decoded = pending.popleft().get()
+            rows, vectors = score_rows(model, decoded, with_embeddings=index is not None)
+            buffer.extend(rows)
+            vector_buffer.extend(vectors)
+            scored += len(decoded)
+            if len(buffer) >= args.rows_per_part:
+                flush()
+
+        # Bounded prefetch: never more than 2 batches per worker in flight
+        for batch in batched(iter_source(args.source, skip=state['processed']), args.batch_size):
+            pending.append(pool.apply_async(decode_batch, (batch,)))
+            if len(pending) >= args.workers * 2:
+                drain_one()
+        while pending:
+            drain_one()
+        flush()
+        print(f"✅ Done: {state['processed']} images scored into {state['parts']} part(s)")
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-score cricket shot images to Parquet/CSV")
+    parser.add_argument('source', help="Directory, .tar/.tar.gz or .zip of images")
+    parser.add_argument('output_dir', help="Directory for part files and the resume checkpoint")
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument('--rows-per-part', type=int, default=10000)
+    parser.add_argument('--model-path', help="Local .keras/.h5 model instead of loading from MLflow")
+    parser.add_argument('--index-dir', help="Also append embeddings to this similarity-search index")
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    try:
+        run(parse_args())
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrupted — rerun the same command to resume from the last checkpoint")
+        sys.exit(130)
+    except Exception as e:
+        print(f"❌ Bulk scoring failed: {e}")
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,180 @@
+"""
+Optimized CPU inference mode.
+
+Enabled with INFERENCE_MODE=optimized. Importing this module (before
+TensorFlow!) configures the process:
+  - intra/inter-op thread pools sized from the CPUs this process may use
+    (INFERENCE_INTRA_OP_THREADS / INFERENCE_INTER_OP_THREADS override)
+  - bfloat16 math inside oneDNN fp32 kernels when the CPU has native bf16
+    (avx512_bf16 / amx_bf16); INFERENCE_BF16=auto|1|0
+
+oneDNN kernels are TensorFlow's own default on x86 (TF_ENABLE_ONEDNN_OPTS
+is left alone and only reported); the bf16 math mode above is oneDNN's.
+
+`optimize(model)` then wraps a Keras model so inference goes through a
+tf.function called directly (skipping Keras predict()'s per-call overhead),
+optionally XLA-compiled with INFERENCE_XLA=1. Batches are padded up to
+power-of-two buckets so only a handful of shapes are traced/compiled.
+
+Compare default / tf.function / tf.function+XLA with:
+    python benchmark_suite.py --compare-cpu-modes
+"""
+import os
+
+import numpy as np
+
+INFERENCE_MODE = os.getenv('INFERENCE_MODE', 'default').lower()
+# Opt-in: on CPU, XLA measured slower than the plain tf.function for MobileNet-style
+# models (depthwise convs); see `benchmark_suite.py --compare-cpu-modes`
+XLA_ENABLED = os.getenv('INFERENCE_XLA', '0') == '1'
+BF16_SETTING = os.getenv('INFERENCE_BF16', 'auto').lower()
+MAX_BUCKET = 64
+
+
+def enabled():
+    return INFERENCE_MODE == 'optimized'
+
+
+def available_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def cpu_flags():
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('flags'):
+                    return set(line.split(':', 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def bf16_supported():
+    return bool(cpu_flags() & {'avx512_bf16', 'amx_bf16'})
+
+
+def thread_settings():
+    cpus = available_cpus()
+    intra = int(os.getenv('INFERENCE_INTRA_OP_THREADS', cpus))
+    inter = int(os.getenv('INFERENCE_INTER_OP_THREADS', 1 if cpus <= 4 else 2))
+    return intra, inter
+
+
+def use_bf16():
+    if BF16_SETTING == 'auto':
+        return bf16_supported()
+    return BF16_SETTING in ('1', 'true', 'yes')
+
+
+def mode_label():
+    """'default', 'tf.function' or 'xla' (used to keep benchmark baselines apart)."""
+    if not enabled():
+        return 'default'
+    return 'xla' if XLA_ENABLED else 'tf.function'
+
+
+def configure_environment():
+    """Environment knobs that TensorFlow only reads at import time."""
+    if not enabled():
+        return
+    if use_bf16():
+        os.environ.setdefault('ONEDNN_DEFAULT_FPMATH_MODE', 'BF16')
+    intra, inter = thread_settings()
+    os.environ.setdefault('OMP_NUM_THREADS', str(intra))
+    os.environ.setdefault('TF_NUM_INTRAOP_THREADS', str(intra))
+    os.environ.setdefault('TF_NUM_INTEROP_THREADS', str(inter))
+
+
+def configure_threads():
+    """Size TF's thread pools; call right after importing TensorFlow, before any op runs."""
+    if not enabled():
+        return None
+    import tensorflow as tf
+    intra, inter = thread_settings()
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(intra)
+        tf.config.threading.set_inter_op_parallelism_threads(inter)
+    except RuntimeError as e:
+        print(f"DEBUG: cpu_inference: thread pools already initialised, keeping defaults ({e})", flush=True)
+    return intra, inter
+
+
+def describe():
+    intra, inter = thread_settings()
+    return {
+        'mode': INFERENCE_MODE,
+        'path': mode_label(),
+        'xla': enabled() and XLA_ENABLED,
+        'onednn_opts_env': os.environ.get('TF_ENABLE_ONEDNN_OPTS', 'unset (TF default)'),
+        'bf16': enabled() and use_bf16(),
+        'bf16_supported': bf16_supported(),
+        'intra_op_threads': intra if enabled() else None,
+        'inter_op_threads': inter if enabled() else None,
+        'cpus': available_cpus(),
+    }
+
+
+def _bucket(n):
+    size = 1
+    while size < n:
+        size *= 2
+    return size
+
+
+class OptimizedModel:
+    """Drop-in wrapper exposing predict() via a direct tf.function forward pass (XLA-compiled if enabled)."""
+
+    def __init__(self, model, jit_compile=XLA_ENABLED):
+        import tensorflow as tf
+        self.model = model
+        self._forward = tf.function(lambda x: model(x, training=False),
+                                    jit_compile=jit_compile, reduce_retracing=True)
+
+    def __getattr__(self, name):
+        # layers/inputs/output etc. come from the wrapped Keras model
+        return getattr(self.model, name)
+
+    def _run(self, batch):
+        n = len(batch)
+        padded = _bucket(n)
+        if padded != n:
+            pad = np.zeros((padded - n,) + batch.shape[1:], dtype=batch.dtype)
+            batch = np.concatenate([batch, pad])
+        return self._forward(batch.astype('float32'))
+
+    def predict(self, x, verbose=0, batch_size=None):
+        x = np.asarray(x)
+        outputs = []
+        for start in range(0, len(x), MAX_BUCKET):
+            chunk = x[start:start + MAX_BUCKET]
+            result = self._run(chunk)
+            if isinstance(result, (list, tuple)):
+                outputs.append([np.asarray(r)[:len(chunk)] for r in result])
+            else:
+                outputs.append(np.asarray(result)[:len(chunk)])
+        if outputs and isinstance(outputs[0], list):
+            return [np.concatenate(parts) for parts in zip(*outputs)]
+        return np.concatenate(outputs) if outputs else np.empty((0,))
+
+    def warmup(self, input_shape, buckets=(1, 2, 4, 8, 16, 32, 64)):
+        """Trace (and with XLA, compile) the common batch shapes up front so requests don't pay for it."""
+        for size in buckets:
+            self._run(np.zeros((size,) + tuple(input_shape), dtype=np.uint8))
+
+
+def optimize(model, warmup_shape=(224, 224, 3)):
+    """Wrap a Keras model for optimized CPU inference (pyfunc models are returned as-is)."""
+    if not enabled() or not hasattr(model, 'layers'):
+        return model
+    print(f"DEBUG: cpu_inference: {describe()}", flush=True)
+    wrapped = OptimizedModel(model)
+    if warmup_shape:
+        wrapped.warmup(warmup_shape)
+    return wrapped
+
+
+configure_environment()
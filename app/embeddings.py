@@ -0,0 +1,228 @@
+"""
+Shot embeddings and nearest-neighbour search.
+
+The classifier's penultimate layer is used as an embedding. Archived
+embeddings live in an on-disk, memory-mapped float32 matrix (L2-normalised,
+so a dot product is cosine similarity) that grows by doubling and is
+searched with chunked, vectorized matrix products.
+
+On-disk layout of an index directory:
+    index.json   - {"dim": D, "count": N, "capacity": C}
+    vectors.f32  - C x D float32 rows, first N valid
+    meta.jsonl   - one JSON object per row ({"id": ..., plus any extra fields})
+    index.lock   - flock()ed exclusively by writers and shared by readers
+
+Several processes may share one directory (e.g. the Flask app and
+`bulk_score.py --index-dir`): every add/search/stats re-reads index.json
+under the lock and picks up rows committed by the other processes.
+
+Ids are unique: adding a row whose id is already indexed is a no-op, so a
+resumed bulk_score run can safely re-add the part it was interrupted in.
+"""
+import os
+import json
+import fcntl
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+SEARCH_CHUNK_ROWS = 65536
+INITIAL_CAPACITY = 1024
+
+
+def build_embedding_model(model):
+    """Keras model returning (penultimate-layer embedding, softmax scores) in one pass."""
+    import tensorflow as tf
+    if not hasattr(model, 'layers') or len(model.layers) < 2:
+        raise ValueError("Embeddings need a Keras model (pyfunc-wrapped models expose no layers)")
+    embedding = model.layers[-2].output
+    if len(embedding.shape) > 2:
+        embedding = tf.keras.layers.Flatten()(embedding)
+    return tf.keras.Model(inputs=model.inputs, outputs=[embedding, model.output])
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class VectorIndex:
+    """Append-only memory-mapped vector store with exact top-k cosine search."""
+
+    def __init__(self, path, dim=None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._vectors = None
+        self._meta = []
+        self._ids = set()
+        self._meta_bytes = 0
+        self.dim, self.count, self.capacity = None, 0, 0
+        os.makedirs(path, exist_ok=True)
+
+        with self._file_lock(fcntl.LOCK_SH):
+            self._refresh()
+        if self.dim is None:
+            self.dim = dim
+        elif dim is not None and dim != self.dim:
+            raise ValueError(f"Index at {path} has dim {self.dim}, expected {dim}")
+
+    # ---- Persistence ---------------------------------------------------------
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.path, 'vectors.f32')
+
+    @property
+    def _meta_path(self):
+        return os.path.join(self.path, 'meta.jsonl')
+
+    @contextmanager
+    def _file_lock(self, mode):
+        """Cross-process lock: LOCK_EX around writes, LOCK_SH around reads."""
+        with open(os.path.join(self.path, 'index.lock'), 'a') as f:
+            fcntl.flock(f, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Pick up rows committed by other processes since we last looked (call under the file lock)."""
+        header = self._read_header()
+        if header is None:
+            return
+        if self.dim is None:
+            self.dim = header['dim']
+        if header['capacity'] != self.capacity or self._vectors is None:
+            self._open(header['capacity'])
+        if header['count'] != self.count:
+            self.count = header['count']
+            self._load_meta()
+
+    def _read_header(self):
+        header_path = os.path.join(self.path, 'index.json')
+        if not os.path.exists(header_path):
+            return None
+        with open(header_path) as f:
+            return json.load(f)
+
+    def _write_header(self):
+        header_path = os.path.join(self.path, 'index.json')
+        tmp = header_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'dim': self.dim, 'count': self.count, 'capacity': self.capacity}, f)
+        os.replace(tmp, header_path)
+
+    def _open(self, capacity):
+        if self._vectors is not None:
+            self._vectors.flush()
+            del self._vectors
+        with open(self._vectors_path, 'ab') as f:
+            f.truncate(capacity * self.dim * 4)
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+        self.capacity = capacity
+
+    def _load_meta(self):
+        # Continue from the last line we read; rows beyond the committed count
+        # (e.g. after a crash mid-insert) are ignored and overwritten by the next add
+        if len(self._meta) > self.count:
+            self._meta, self._ids, self._meta_bytes = [], set(), 0
+        if len(self._meta) < self.count and os.path.exists(self._meta_path):
+            with open(self._meta_path, 'rb') as f:
+                f.seek(self._meta_bytes)
+                while len(self._meta) < self.count:
+                    line = f.readline()
+                    if not line.endswith(b'\n'):
+                        break
+                    meta = json.loads(line)
+                    self._meta.append(meta)
+                    self._ids.add(meta.get('id'))
+                    self._meta_bytes += len(line)
+        self.count = min(self.count, len(self._meta))
+
+    # ---- Insert ----------------------------------------------------------------
+    def add(self, vectors, metas):
+        """Append vectors with one metadata dict each (must contain 'id'); ids already indexed are skipped. Returns new count."""
+        vectors = normalize(vectors)
+        if len(vectors) != len(metas):
+            raise ValueError("vectors and metas must have the same length")
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._refresh()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-d vectors, got {vectors.shape[1]}")
+            keep, seen = [], set()
+            for i, meta in enumerate(metas):
+                if meta['id'] not in self._ids and meta['id'] not in seen:
+                    keep.append(i)
+                    seen.add(meta['id'])
+            if not keep:
+                return self.count
+            vectors = vectors[keep]
+            metas = [metas[i] for i in keep]
+            needed = self.count + len(vectors)
+            if needed > self.capacity:
+                capacity = max(self.capacity, INITIAL_CAPACITY)
+                while capacity < needed:
+                    capacity *= 2
+                self._open(capacity)
+
+            self._vectors[self.count:needed] = vectors
+            self._vectors.flush()
+            data = ''.join(json.dumps(meta) + '\n' for meta in metas).encode('utf-8')
+            with open(self._meta_path, 'ab') as f:
+                f.truncate(self._meta_bytes)
+                f.write(data)
+            self._meta.extend(metas)
+            self._ids.update(seen)
+            self._meta_bytes += len(data)
+            # Commit point: the header count is only advanced once data is on disk
+            self.count = needed
+            self._write_header()
+            return self.count
+
+    # ---- Search ----------------------------------------------------------------
+    def search(self, query, k=10):
+        """Top-k most similar rows to `query` as a list of meta dicts with a 'score'."""
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._refresh()
+            count = self.count
+            vectors = self._vectors
+            meta = self._meta
+        if count == 0 or vectors is None:
+            return []
+        q = normalize(query)[0]
+        if q.shape[0] != self.dim:
+            raise ValueError(f"Expected {self.dim}-d query, got {q.shape[0]}")
+        k = min(k, count)
+
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        for start in range(0, count, SEARCH_CHUNK_ROWS):
+            stop = min(start + SEARCH_CHUNK_ROWS, count)
+            scores = vectors[start:stop] @ q
+            if len(scores) > k:
+                top = np.argpartition(scores, -k)[-k:]
+            else:
+                top = np.arange(len(scores))
+            best_scores = np.concatenate([best_scores, scores[top]])
+            best_rows = np.concatenate([best_rows, top + start])
+            if len(best_scores) > k:
+                keep = np.argpartition(best_scores, -k)[-k:]
+                best_scores, best_rows = best_scores[keep], best_rows[keep]
+
+        order = np.argsort(-best_scores)
+        results = []
+        for i in order:
+            item = dict(meta[int(best_rows[i])])
+            item['score'] = round(float(best_scores[i]), 6)
+            results.append(item)
+        return results
+
+    def stats(self):
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._refresh()
+        return {'path': self.path, 'dim': self.dim, 'count': self.count, 'capacity': self.capacity}
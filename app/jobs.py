@@ -0,0 +1,249 @@
+"""
+Local background job subsystem for long-running inference.
+
+Jobs are persisted in SQLite (no external services) and executed by a pool of
+worker threads in priority order. Inputs live in a per-job directory next to
+the database. Clients get a job id immediately and poll or stream status.
+
+    submit(kind, params, priority, files) -> job id
+    get(job_id) / list_jobs() / cancel(job_id)
+
+Handlers are registered per kind with `register(kind, fn)` and called as
+`fn(job, ctx)`, where `ctx.progress(fraction)` reports progress and
+`ctx.cancelled()` lets long jobs stop cooperatively. A handler's return value
+(JSON-serialisable) becomes the job result. Finished jobs expire after
+JOBS_RESULT_TTL_SECONDS. Jobs left 'running' by a crash are re-queued by
+`start()`, which only the serving process may call: other processes that
+import the app (e.g. bulk_score.py) must neither recover nor claim its jobs.
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import threading
+import traceback
+
+JOBS_DIR = os.getenv('JOBS_DIR', '/app/jobs')
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', '2'))
+JOBS_RESULT_TTL_SECONDS = float(os.getenv('JOBS_RESULT_TTL_SECONDS', '3600'))
+# Uploads to POST /jobs (videos) may exceed the app-wide MAX_CONTENT_LENGTH
+JOBS_MAX_UPLOAD_BYTES = int(os.getenv('JOBS_MAX_UPLOAD_MB', '512')) * 1024 * 1024
+CLEANUP_INTERVAL_SECONDS = 60
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+TERMINAL = (SUCCEEDED, FAILED, CANCELLED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    params TEXT,
+    result TEXT,
+    error TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created);
+"""
+
+
+class JobContext:
+    """Handed to handlers: progress reporting and cooperative cancellation."""
+
+    def __init__(self, manager, job_id):
+        self.manager = manager
+        self.job_id = job_id
+        self.input_dir = manager.input_dir(job_id)
+
+    def progress(self, fraction):
+        self.manager._execute("UPDATE jobs SET progress = ? WHERE id = ?", (float(min(max(fraction, 0), 1)), self.job_id))
+
+    def cancelled(self):
+        row = self.manager._query_one("SELECT cancel_requested FROM jobs WHERE id = ?", (self.job_id,))
+        return bool(row and row['cancel_requested'])
+
+
+class JobManager:
+    """SQLite-backed priority job queue with a thread worker pool."""
+
+    def __init__(self, base_dir=JOBS_DIR, workers=JOBS_WORKERS, ttl=JOBS_RESULT_TTL_SECONDS):
+        self.base_dir = base_dir
+        self.workers = workers
+        self.ttl = ttl
+        self.handlers = {}
+        self._wakeup = threading.Condition()
+        self._claim_lock = threading.Lock()
+        self._started = False
+        os.makedirs(base_dir, exist_ok=True)
+        self.db_path = os.path.join(base_dir, 'jobs.db')
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    # ---- SQLite helpers ----------------------------------------------------------
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _execute(self, sql, args=()):
+        with self._connect() as conn:
+            return conn.execute(sql, args).rowcount
+
+    def _query_one(self, sql, args=()):
+        with self._connect() as conn:
+            return conn.execute(sql, args).fetchone()
+
+    def input_dir(self, job_id):
+        return os.path.join(self.base_dir, job_id)
+
+    # ---- Public API ----------------------------------------------------------------
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def start(self):
+        """Recover crashed jobs and start the workers; call once, from the serving process only."""
+        if self._started:
+            return
+        self._started = True
+        # Crash recovery: whatever was running when we died goes back on the queue
+        recovered = self._execute("UPDATE jobs SET status = ?, started = NULL, progress = 0 WHERE status = ?",
+                                  (QUEUED, RUNNING))
+        if recovered:
+            print(f"DEBUG: re-queued {recovered} job(s) left running by a previous process", flush=True)
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, daemon=True, name=f'job-worker-{i}').start()
+        threading.Thread(target=self._cleanup_loop, daemon=True, name='job-cleanup').start()
+
+    def submit(self, kind, params=None, priority=0, files=None):
+        """Queue a job; `files` maps filename -> file object/bytes saved into the job dir."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        job_dir = self.input_dir(job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        for name, data in (files or {}).items():
+            path = os.path.join(job_dir, os.path.basename(name))
+            if hasattr(data, 'save'):
+                data.save(path)
+            else:
+                with open(path, 'wb') as f:
+                    f.write(data)
+        self._execute(
+            "INSERT INTO jobs (id, kind, priority, status, params, created) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, int(priority), QUEUED, json.dumps(params or {}), time.time()),
+        )
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id):
+        row = self._query_one("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return self._to_dict(row) if row else None
+
+    def list_jobs(self, limit=50, status=None):
+        sql = "SELECT * FROM jobs"
+        args = []
+        if status:
+            sql += " WHERE status = ?"
+            args.append(status)
+        sql += " ORDER BY created DESC LIMIT ?"
+        args.append(int(limit))
+        with self._connect() as conn:
+            rows = conn.execute(sql, args).fetchall()
+        return [self._to_dict(row, include_result=False) for row in rows]
+
+    def cancel(self, job_id):
+        """Cancel a queued job immediately or ask a running one to stop. Returns the job or None."""
+        with self._claim_lock:
+            changed = self._execute(
+                "UPDATE jobs SET status = ?, finished = ?, cancel_requested = 1 WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED),
+            )
+            if not changed:
+                self._execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+        return self.get(job_id)
+
+    @staticmethod
+    def _to_dict(row, include_result=True):
+        job = {
+            'id': row['id'],
+            'kind': row['kind'],
+            'priority': row['priority'],
+            'status': row['status'],
+            'progress': round(row['progress'], 4),
+            'error': row['error'],
+            'created': row['created'],
+            'started': row['started'],
+            'finished': row['finished'],
+            'cancel_requested': bool(row['cancel_requested']),
+        }
+        if include_result:
+            job['params'] = json.loads(row['params']) if row['params'] else {}
+            job['result'] = json.loads(row['result']) if row['result'] else None
+        return job
+
+    # ---- Workers -------------------------------------------------------------------
+    def _claim(self):
+        with self._claim_lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY priority DESC, created LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET status = ?, started = ? WHERE id = ?", (RUNNING, time.time(), row['id']))
+            return self._to_dict(row)
+
+    def _worker(self):
+        while True:
+            job = self._claim()
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=5)
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        ctx = JobContext(self, job['id'])
+        print(f"DEBUG: job {job['id']} ({job['kind']}) started", flush=True)
+        try:
+            result = self.handlers[job['kind']](job, ctx)
+            status = CANCELLED if ctx.cancelled() else SUCCEEDED
+            self._execute(
+                "UPDATE jobs SET status = ?, result = ?, progress = ?, finished = ? WHERE id = ?",
+                (status, json.dumps(result), 1.0 if status == SUCCEEDED else job['progress'], time.time(), job['id']),
+            )
+            print(f"DEBUG: job {job['id']} {status}", flush=True)
+        except Exception as e:
+            traceback.print_exc()
+            self._execute("UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ?",
+                          (FAILED, str(e), time.time(), job['id']))
+            print(f"DEBUG: job {job['id']} failed: {e}", flush=True)
+
+    def _cleanup_loop(self):
+        while True:
+            time.sleep(CLEANUP_INTERVAL_SECONDS)
+            try:
+                self.expire()
+            except Exception as e:
+                print(f"DEBUG: job cleanup failed: {e}", flush=True)
+
+    def expire(self):
+        """Delete finished jobs (rows + input dirs) older than the TTL."""
+        cutoff = time.time() - self.ttl
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id FROM jobs WHERE status IN ({','.join('?' * len(TERMINAL))}) AND finished < ?",
+                (*TERMINAL, cutoff),
+            ).fetchall()
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(row['id'],) for row in rows])
+        for row in rows:
+            shutil.rmtree(self.input_dir(row['id']), ignore_errors=True)
+        return len(rows)
@@ -0,0 +1,188 @@
+"""
+Live-feed classification over a WebSocket.
+
+The client streams frames (JPEG/PNG bytes or raw 224x224x3 uint8) as binary
+messages. A per-connection worker always classifies the newest frame only:
+frames that arrive while inference is running overwrite the pending slot and
+are counted as dropped, so end-to-end latency stays bounded by one inference.
+Frames are also dropped when the app has no free in-flight inference slot
+(predict_fn raises FrameDropped), so live traffic respects admission control.
+
+Text messages control the session:
+    {"type": "config", "smooth": 0.6}   exponential smoothing factor (0 = off)
+    {"type": "stats"}                    reply with per-connection stats
+"""
+import os
+import json
+import time
+import threading
+import numpy as np
+
+import preprocessing
+
+LIVE_MAX_CONNECTIONS = int(os.getenv('LIVE_MAX_CONNECTIONS', '8'))
+
+_connections = 0
+_connections_lock = threading.Lock()
+
+
+class FrameDropped(Exception):
+    """Raised by predict_fn to skip a frame without reporting an error (e.g. no inference slot)."""
+
+
+def decode_frame(data):
+    """Binary message -> uint8 (224, 224, 3) array."""
+    if len(data) == preprocessing.FRAME_BYTES:
+        return np.frombuffer(data, dtype=np.uint8).reshape(preprocessing.FRAME_SHAPE)
+    return preprocessing.preprocess(data)
+
+
+class LiveSession:
+    """Latest-frame-wins classifier loop for one WebSocket connection."""
+
+    def __init__(self, ws, predict_fn, smooth=0.0):
+        self.ws = ws
+        self.predict_fn = predict_fn
+        self.smooth = smooth
+        self.smoothed = None
+
+        self._cond = threading.Condition()
+        self._pending = None   # (received_at, bytes) of the newest unprocessed frame
+        self._closed = False
+        self._send_lock = threading.Lock()
+
+        self.started = time.time()
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.latency_ms_total = 0.0
+
+    # ---- Receive side -------------------------------------------------------
+    def offer(self, data):
+        with self._cond:
+            self.received += 1
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = (time.perf_counter(), data)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    # ---- Worker side -----------------------------------------------------------
+    def _next_frame(self):
+        with self._cond:
+            while self._pending is None and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            frame, self._pending = self._pending, None
+            return frame
+
+    def run_worker(self):
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                return
+            received_at, data = frame
+            try:
+                probs = np.asarray(self.predict_fn(decode_frame(data)[None])[0], dtype=np.float64)
+            except FrameDropped:
+                with self._cond:
+                    self.dropped += 1
+                continue
+            except Exception as e:
+                self.errors += 1
+                self.send({'type': 'error', 'error': str(e)})
+                continue
+
+            if self.smooth > 0 and self.smoothed is not None:
+                self.smoothed = self.smooth * self.smoothed + (1 - self.smooth) * probs
+            else:
+                self.smoothed = probs
+            latency_ms = (time.perf_counter() - received_at) * 1000
+            self.processed += 1
+            self.latency_ms_total += latency_ms
+
+            predicted_class, confidence = preprocessing.top_prediction(self.smoothed)
+            raw_class, raw_confidence = preprocessing.top_prediction(probs)
+            self.send({
+                'type': 'prediction',
+                'prediction': predicted_class,
+                'confidence': round(confidence, 2),
+                'raw_prediction': raw_class,
+                'raw_confidence': round(raw_confidence, 2),
+                'latency_ms': round(latency_ms, 1),
+                'stats': self.stats(),
+            })
+
+    def send(self, payload):
+        with self._send_lock:
+            try:
+                self.ws.send(json.dumps(payload))
+            except Exception:
+                self.close()
+
+    def stats(self):
+        elapsed = max(time.time() - self.started, 1e-9)
+        return {
+            'received': self.received,
+            'processed': self.processed,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'processed_fps': round(self.processed / elapsed, 2),
+            'avg_latency_ms': round(self.latency_ms_total / self.processed, 1) if self.processed else None,
+            'smooth': self.smooth,
+        }
+
+    def handle_text(self, text):
+        # A bad control message gets an error frame; it must never end the connection
+        try:
+            message = json.loads(text)
+            if not isinstance(message, dict):
+                raise ValueError('control message must be a JSON object')
+            if message.get('type') == 'config' and 'smooth' in message:
+                smooth = float(message['smooth'])
+                if smooth != smooth:  # NaN
+                    raise ValueError('smooth must be a number')
+                self.smooth = min(max(smooth, 0.0), 0.99)
+                self.smoothed = None
+        except (ValueError, TypeError, AttributeError) as e:
+            self.send({'type': 'error', 'error': f'Invalid control message: {e}'})
+            return
+        self.send({'type': 'stats', 'stats': self.stats()})
+
+
+def serve(ws, predict_fn, smooth=0.0):
+    """Run one connection until the client disconnects."""
+    global _connections
+    with _connections_lock:
+        if _connections >= LIVE_MAX_CONNECTIONS:
+            ws.send(json.dumps({'type': 'error', 'error': 'Too many live connections'}))
+            ws.close()
+            return
+        _connections += 1
+
+    session = LiveSession(ws, predict_fn, smooth)
+    worker = threading.Thread(target=session.run_worker, daemon=True)
+    worker.start()
+    try:
+        while True:
+            message = ws.receive()
+            if message is None:
+                break
+            if isinstance(message, (bytes, bytearray)):
+                session.offer(bytes(message))
+            else:
+                session.handle_text(message)
+    except Exception as e:
+        print(f"DEBUG: live feed connection closed: {e}", flush=True)
+    finally:
+        session.close()
+        worker.join(timeout=5)
+        with _connections_lock:
+            _connections -= 1
+        print(f"DEBUG: live feed session stats: {session.stats()}", flush=True)
@@ -0,0 +1,293 @@
+"""
+Constant-memory drift and confidence monitoring.
+
+The inference path feeds each prediction into fixed-size streaming sketches:
+  - per-class confidence histograms (1000 bins on [0, 1], quantiles to 0.1%)
+  - per-channel histograms of the 224x224 input's pixel mean and std
+  - class frequency counters
+
+Sketches cover tumbling windows of MONITORING_SNAPSHOT_INTERVAL_SECONDS: when
+a window closes it is snapshotted to JSON, kept in memory (newest
+MONITORING_SNAPSHOT_KEEP) and the sketches start from zero, so a recent shift
+is not diluted by all traffic since startup. Windows can be merged and
+compared against a training baseline with the Population Stability Index (PSI).
+
+Build a pixel-statistics baseline from training images:
+    python monitoring.py baseline /data/train baseline.json
+(a snapshot taken on validation traffic also works as a full baseline)
+"""
+import os
+import sys
+import json
+import time
+import threading
+from collections import deque
+import numpy as np
+
+import preprocessing
+
+CHANNELS = ('r', 'g', 'b')
+SNAPSHOT_DIR = os.getenv('MONITORING_SNAPSHOT_DIR', '/app/monitoring')
+SNAPSHOT_INTERVAL_SECONDS = float(os.getenv('MONITORING_SNAPSHOT_INTERVAL_SECONDS', '300'))
+SNAPSHOT_KEEP = int(os.getenv('MONITORING_SNAPSHOT_KEEP', '48'))
+PSI_DRIFT_THRESHOLD = 0.2
+PSI_BINS = 10
+PSI_MIN_SAMPLES = int(os.getenv('MONITORING_PSI_MIN_SAMPLES', '200'))
+
+
+class Histogram:
+    """Fixed-range, fixed-bin streaming histogram (mergeable, O(bins) memory)."""
+
+    def __init__(self, lo, hi, bins, counts=None):
+        self.lo, self.hi, self.bins = float(lo), float(hi), int(bins)
+        self.counts = np.zeros(self.bins, dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+
+    def add(self, values):
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        idx = ((values - self.lo) / (self.hi - self.lo) * self.bins).astype(np.int64)
+        np.add.at(self.counts, np.clip(idx, 0, self.bins - 1), 1)
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def quantile(self, q):
+        total = self.total
+        if total == 0:
+            return None
+        cumulative = np.cumsum(self.counts)
+        b = int(np.searchsorted(cumulative, q * total, side='left'))
+        return self.lo + (b + 0.5) * (self.hi - self.lo) / self.bins
+
+    def to_dict(self):
+        return {'lo': self.lo, 'hi': self.hi, 'bins': self.bins, 'counts': self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['lo'], data['hi'], data['bins'], data['counts'])
+
+
+def psi(expected_counts, actual_counts, coarsen_to=PSI_BINS, min_samples=PSI_MIN_SAMPLES, eps=1e-4):
+    """
+    Population Stability Index between two count vectors over the same bins.
+
+    Fine bins are first merged into ~`coarsen_to` bins of roughly equal
+    expected mass (deciles by default), whatever the source bin count, so
+    sparse tails don't dominate. Returns None when either side has fewer than
+    `min_samples` observations - too few to tell drift from noise.
+    """
+    expected = np.asarray(expected_counts, dtype=np.float64)
+    actual = np.asarray(actual_counts, dtype=np.float64)
+    if expected.sum() == 0 or actual.sum() < max(min_samples, 1):
+        return None
+    if len(expected) > coarsen_to:
+        cumulative = np.cumsum(expected) / expected.sum()
+        quantiles = np.arange(1, coarsen_to) / coarsen_to
+        # Start of each coarse bin: first fine bin past each expected-mass quantile
+        starts = np.unique(np.concatenate([[0], np.searchsorted(cumulative, quantiles, side='right')]))
+        starts = starts[starts < len(expected)]
+        expected = np.add.reduceat(expected, starts)
+        actual = np.add.reduceat(actual, starts)
+    e = np.maximum(expected / expected.sum(), eps)
+    a = np.maximum(actual / actual.sum(), eps)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+class StreamMonitor:
+    """Thread-safe bundle of sketches fed from the inference path."""
+
+    def __init__(self, snapshot_dir=SNAPSHOT_DIR, interval=SNAPSHOT_INTERVAL_SECONDS, keep=SNAPSHOT_KEEP):
+        self.snapshot_dir = snapshot_dir
+        self.interval = interval
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._last_snapshot = time.time()
+        self.windows = deque(maxlen=keep)
+        self.reset()
+
+    def reset(self):
+        self.started = time.time()
+        self.class_counts = np.zeros(len(preprocessing.class_names), dtype=np.int64)
+        self.confidence = {c: Histogram(0.0, 1.0, 1000) for c in preprocessing.class_names}
+        self.pixel_mean = {c: Histogram(0.0, 256.0, 256) for c in CHANNELS}
+        self.pixel_std = {c: Histogram(0.0, 128.0, 128) for c in CHANNELS}
+
+    def record_pixels(self, img_batch):
+        """Feed per-channel mean/std of a (N, 224, 224, 3) uint8 batch."""
+        flat = np.asarray(img_batch).reshape(len(img_batch), -1, 3).astype(np.float32)
+        means = flat.mean(axis=1)
+        stds = flat.std(axis=1)
+        with self._lock:
+            for i, c in enumerate(CHANNELS):
+                self.pixel_mean[c].add(means[:, i])
+                self.pixel_std[c].add(stds[:, i])
+
+    def record(self, img_batch, probs):
+        """Feed a batch of model inputs and their softmax outputs."""
+        probs = np.atleast_2d(np.asarray(probs))
+        # Close an expired window first so this batch lands in the new one
+        self.maybe_snapshot()
+        self.record_pixels(img_batch)
+        top = probs.argmax(axis=1)
+        with self._lock:
+            self.class_counts += np.bincount(top, minlength=len(self.class_counts))
+            for idx, p in zip(top, probs):
+                self.confidence[preprocessing.class_names[idx]].add(p[idx])
+
+    def to_dict(self):
+        """Sketches of the current (still open) window."""
+        with self._lock:
+            return self._to_dict()
+
+    def _to_dict(self):
+        return {
+            'started': self.started,
+            'taken': time.time(),
+            'total': int(self.class_counts.sum()),
+            'class_counts': dict(zip(preprocessing.class_names, self.class_counts.tolist())),
+            'confidence': {c: h.to_dict() for c, h in self.confidence.items()},
+            'confidence_quantiles': {
+                c: {q: h.quantile(float(q)) for q in ('0.1', '0.5', '0.9')}
+                for c, h in self.confidence.items()
+            },
+            'pixel_mean': {c: h.to_dict() for c, h in self.pixel_mean.items()},
+            'pixel_std': {c: h.to_dict() for c, h in self.pixel_std.items()},
+        }
+
+    def maybe_snapshot(self):
+        if time.time() - self._last_snapshot < self.interval:
+            return None
+        with self._lock:
+            if time.time() - self._last_snapshot < self.interval:
+                return None
+            self._last_snapshot = time.time()
+        return self.snapshot()
+
+    def rotate(self):
+        """Close the current window: keep its sketches and start counting from zero."""
+        with self._lock:
+            data = self._to_dict()
+            self.reset()
+            self.windows.append(data)
+        return data
+
+    def recent(self, windows=1):
+        """Merge of the newest `windows` closed windows (the open one if none has closed yet)."""
+        self.maybe_snapshot()
+        with self._lock:
+            closed = list(self.windows)[-windows:] if windows > 0 else []
+        if not closed:
+            data = self.to_dict()
+            data['windows'] = 0
+            return data
+        data = merge(closed)
+        data['windows'] = len(closed)
+        return data
+
+    def snapshot(self):
+        """Close the window and write it to the snapshot dir, keeping the newest `keep` files."""
+        data = self.rotate()
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            path = os.path.join(self.snapshot_dir, f"snapshot-{int(data['taken'])}.json")
+            with open(path + '.tmp', 'w') as f:
+                json.dump(data, f)
+            os.replace(path + '.tmp', path)
+            snapshots = sorted(n for n in os.listdir(self.snapshot_dir) if n.startswith('snapshot-'))
+            for old in snapshots[:-self.keep]:
+                os.remove(os.path.join(self.snapshot_dir, old))
+            print(f"DEBUG: monitoring snapshot written to {path}", flush=True)
+            return path
+        except Exception as e:
+            print(f"DEBUG: monitoring snapshot failed: {e}", flush=True)
+            return None
+
+
+def merge(snapshots):
+    """Sum several window snapshots (same bins) into one."""
+    merged = {
+        'started': min(snap['started'] for snap in snapshots),
+        'taken': max(snap['taken'] for snap in snapshots),
+        'total': sum(snap['total'] for snap in snapshots),
+        'class_counts': {c: sum(snap['class_counts'].get(c, 0) for snap in snapshots)
+                         for c in preprocessing.class_names},
+    }
+    for section in ('confidence', 'pixel_mean', 'pixel_std'):
+        merged[section] = {}
+        for key, first in snapshots[0][section].items():
+            hist = Histogram.from_dict(first)
+            for snap in snapshots[1:]:
+                hist.counts += np.asarray(snap[section][key]['counts'], dtype=np.int64)
+            merged[section][key] = hist.to_dict()
+    merged['confidence_quantiles'] = {
+        c: {q: Histogram.from_dict(h).quantile(float(q)) for q in ('0.1', '0.5', '0.9')}
+        for c, h in merged['confidence'].items()
+    }
+    return merged
+
+
+def compare(baseline, current, threshold=PSI_DRIFT_THRESHOLD):
+    """
+    PSI per monitored feature for the sections present in both snapshots.
+    Returns {'features': {name: psi}, 'drifted': [names over threshold],
+    'insufficient': [names with too few samples to score]}.
+    """
+    features = {}
+    insufficient = []
+    for section in ('pixel_mean', 'pixel_std', 'confidence'):
+        for key, hist in baseline.get(section, {}).items():
+            other = current.get(section, {}).get(key)
+            if other is None:
+                continue
+            value = psi(hist['counts'], other['counts'])
+            if value is None:
+                insufficient.append(f'{section}.{key}')
+            else:
+                features[f'{section}.{key}'] = round(value, 4)
+    if baseline.get('class_counts') and current.get('class_counts'):
+        names = preprocessing.class_names
+        value = psi([baseline['class_counts'].get(c, 0) for c in names],
+                    [current['class_counts'].get(c, 0) for c in names])
+        if value is None:
+            insufficient.append('class_frequency')
+        else:
+            features['class_frequency'] = round(value, 4)
+    drifted = sorted(name for name, value in features.items() if value > threshold)
+    return {'features': features, 'drifted': drifted, 'insufficient': sorted(insufficient), 'threshold': threshold}
+
+
+def build_baseline(image_dir, limit=None):
+    """Pixel-statistics baseline from a directory of training images."""
+    baseline = StreamMonitor(snapshot_dir=None, interval=float('inf'))
+    seen = 0
+    for root, dirs, files in os.walk(image_dir):
+        dirs.sort()
+        if limit and seen >= limit:
+            break
+        for name in sorted(files):
+            if not name.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.webp')):
+                continue
+            try:
+                baseline.record_pixels(preprocessing.preprocess(os.path.join(root, name))[None])
+            except Exception as e:
+                print(f"⚠️ Skipping {name}: {e}")
+                continue
+            seen += 1
+            if limit and seen >= limit:
+                break
+    data = baseline.to_dict()
+    data['images'] = seen
+    # Class/confidence sections are only meaningful with a model; keep pixel stats
+    for section in ('confidence', 'confidence_quantiles', 'class_counts'):
+        data.pop(section)
+    return data
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] != 'baseline':
+        print("Usage: python monitoring.py baseline IMAGE_DIR OUTPUT.json")
+        sys.exit(2)
+    result = build_baseline(sys.argv[2])
+    with open(sys.argv[3], 'w') as f:
+        json.dump(result, f)
+    print(f"✅ Baseline from {result['images']} images written to {sys.argv[3]}")
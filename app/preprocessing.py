@@ -0,0 +1,149 @@
+"""
+Image preprocessing shared by the Flask app and offline tools.
+Kept free of TensorFlow/MLflow imports so worker processes stay light.
+
+Every image is probed from its header first (format, dimensions, pixel
+count) so pathological inputs are rejected before any pixel is decoded,
+and large JPEGs are decoded at reduced resolution via DCT scaling.
+"""
+import io
+import os
+import numpy as np
+from PIL import Image
+
+IMAGE_SIZE = (224, 224)
+class_names = ["pullshot", "sweep", "legglance-flick", "drive"]
+
+# ---- Decode budgets (override via environment) ------------------------------
+MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', str(40_000_000)))
+MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', '12000'))
+ALLOWED_FORMATS = frozenset(
+    f.strip().upper() for f in os.getenv('IMAGE_ALLOWED_FORMATS', 'JPEG,MPO,PNG,WEBP,BMP,GIF').split(',') if f.strip()
+)
+
+# Make PIL itself refuse anything past our budget, even outside probe()
+Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+
+
+class ImageRejected(ValueError):
+    """Input failed header validation; `status` is the HTTP code to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _open(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    try:
+        return Image.open(source)
+    except Image.DecompressionBombError as e:
+        raise ImageRejected(str(e), status=413)
+    except Exception as e:
+        raise ImageRejected(f"Unrecognised image: {e}", status=415)
+
+
+def check_header(img):
+    """Validate an opened (not yet decoded) image against the format and pixel budgets."""
+    if img.format not in ALLOWED_FORMATS:
+        raise ImageRejected(f"Unsupported image format: {img.format}", status=415)
+    width, height = img.size
+    if width <= 0 or height <= 0:
+        raise ImageRejected(f"Invalid image dimensions: {width}x{height}")
+    if max(width, height) > MAX_DIMENSION:
+        raise ImageRejected(f"Image dimension {max(width, height)} exceeds limit {MAX_DIMENSION}", status=413)
+    if width * height > MAX_PIXELS:
+        raise ImageRejected(f"Image has {width * height} pixels, limit is {MAX_PIXELS}", status=413)
+
+
+def probe(source):
+    """
+    Read only the image header and validate it; returns (format, (width, height)).
+    File objects are rewound so the caller can still read/save them.
+    """
+    position = source.tell() if hasattr(source, 'tell') else None
+    img = _open(source)
+    try:
+        check_header(img)
+        return img.format, img.size
+    finally:
+        if position is not None:
+            source.seek(position)
+
+
+def load_rgb(source):
+    """Open an image from a path, file object or raw bytes and return it as RGB."""
+    img = _open(source)
+    check_header(img)
+    if img.format in ('JPEG', 'MPO'):
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale while staying >= model input size
+        img.draft('RGB', IMAGE_SIZE)
+    return img.convert('RGB')
+
+
+def to_array(img):
+    """Resize a PIL image to the model's input size and return a uint8 HxWx3 array."""
+    img = img.resize(IMAGE_SIZE)
+    return np.asarray(img, dtype=np.uint8)
+
+
+def preprocess(source):
+    """Path/bytes/file object -> uint8 array of shape (224, 224, 3)."""
+    return to_array(load_rgb(source))
+
+
+def top_prediction(probs):
+    """Return (class_name, confidence_percent) for one row of softmax scores."""
+    idx = int(np.argmax(probs))
+    return class_names[idx], float(probs[idx] * 100)
+
+
+# ---- Raw tensor payloads --------------------------------------------------------
+RAW_MAX_BATCH = int(os.getenv('RAW_MAX_BATCH', '64'))
+FRAME_SHAPE = IMAGE_SIZE[::-1] + (3,)
+FRAME_BYTES = FRAME_SHAPE[0] * FRAME_SHAPE[1] * FRAME_SHAPE[2]
+
+
+def _npy_view(data):
+    """Zero-copy view of a .npy payload: parse the header, then frombuffer the body."""
+    stream = io.BytesIO(data)
+    try:
+        version = np.lib.format.read_magic(stream)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+    except ValueError as e:
+        raise ImageRejected(f"Invalid .npy payload: {e}")
+    if fortran_order:
+        raise ImageRejected("Fortran-ordered .npy arrays are not supported")
+    if dtype != np.uint8:
+        raise ImageRejected(f"Expected uint8 tensor, got {dtype}", status=415)
+    count = int(np.prod(shape)) if shape else 1
+    offset = stream.tell()
+    if len(data) - offset < count:
+        raise ImageRejected("Truncated .npy payload")
+    return np.frombuffer(data, dtype=np.uint8, count=count, offset=offset).reshape(shape)
+
+
+def tensor_from_payload(data, content_type=''):
+    """
+    Turn a request body into a (N, 224, 224, 3) uint8 view without copying.
+    Accepts a NumPy .npy file (application/x-npy) or raw concatenated
+    224x224x3 frames (application/octet-stream).
+    """
+    if 'npy' in (content_type or '') or data[:6] == b'\x93NUMPY':
+        batch = _npy_view(data)
+    else:
+        if not data or len(data) % FRAME_BYTES:
+            raise ImageRejected(f"Raw payload must be a multiple of {FRAME_BYTES} bytes (224x224x3 uint8 frames)")
+        batch = np.frombuffer(data, dtype=np.uint8).reshape((-1,) + FRAME_SHAPE)
+
+    if batch.shape == FRAME_SHAPE:
+        batch = batch[None]
+    if batch.ndim != 4 or batch.shape[1:] != FRAME_SHAPE:
+        raise ImageRejected(f"Expected shape (N, {', '.join(map(str, FRAME_SHAPE))}), got {batch.shape}")
+    if not 1 <= batch.shape[0] <= RAW_MAX_BATCH:
+        raise ImageRejected(f"Batch size {batch.shape[0]} outside 1..{RAW_MAX_BATCH}", status=413)
+    return batch
@@ -0,0 +1,173 @@
+"""
+Opt-in, sampled per-request profiling.
+
+A request is profiled when it carries `X-Profile: 1` (or `X-Profile: tf` to
+also capture a TensorFlow profiler trace around model inference) or is
+picked by PROFILE_SAMPLE_RATE. When ADMIN_TOKEN is set the header is only
+honoured together with a matching `X-Admin-Token`. Each trace is a directory in a bounded ring
+under PROFILE_DIR containing:
+    python.prof   - cProfile stats (load with pstats / snakeviz)
+    summary.txt   - top functions by cumulative time
+    tf/           - TensorBoard profiler trace (only for X-Profile: tf)
+
+When sampling is off and no header is sent the overhead is one header
+lookup and one comparison per request.
+"""
+import io
+import os
+import hmac
+import time
+import uuid
+import random
+import shutil
+import pstats
+import zipfile
+import cProfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+from flask import request, g, jsonify, send_file
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', '/app/profiles')
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '20'))
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+PROFILE_HEADER = 'X-Profile'
+
+_ring_lock = threading.Lock()
+# cProfile and the TF profiler are both process-global; one capture at a time
+_capture_lock = threading.Lock()
+
+
+def admin_authorized(require_token=False):
+    """X-Admin-Token matches ADMIN_TOKEN; with no token configured, open unless `require_token`."""
+    if not ADMIN_TOKEN:
+        return not require_token
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+
+
+def _wanted():
+    """Return None, 'python' or 'tf' for the current request."""
+    flag = request.headers.get(PROFILE_HEADER)
+    # Forced captures write to disk and stall the request; admins only
+    if flag and admin_authorized():
+        flag = flag.lower()
+        if flag == 'tf':
+            return 'tf'
+        if flag in ('1', 'true', 'python'):
+            return 'python'
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return 'python'
+    return None
+
+
+def _trim_ring():
+    with _ring_lock:
+        entries = sorted(e for e in os.listdir(PROFILE_DIR) if os.path.isdir(os.path.join(PROFILE_DIR, e)))
+        for old in entries[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else entries:
+            shutil.rmtree(os.path.join(PROFILE_DIR, old), ignore_errors=True)
+
+
+def profiled(view):
+    """Decorator: wrap sampled requests in cProfile and save the trace to the ring dir."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        mode = _wanted()
+        if mode is None or not _capture_lock.acquire(blocking=False):
+            return view(*args, **kwargs)
+        try:
+            # Sortable by time so the ring trims the oldest traces first
+            trace_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{uuid.uuid4().hex[:6]}"
+            trace_dir = os.path.join(PROFILE_DIR, trace_id)
+            os.makedirs(trace_dir, exist_ok=True)
+            g.profile_trace_dir = trace_dir
+            g.profile_tf = mode == 'tf'
+
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                result = view(*args, **kwargs)
+            finally:
+                profiler.disable()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                _save(profiler, trace_dir, elapsed_ms)
+                _trim_ring()
+                print(f"DEBUG: profiled {request.path} in {elapsed_ms:.1f} ms -> {trace_dir}", flush=True)
+        finally:
+            _capture_lock.release()
+
+        if isinstance(result, tuple):
+            body, *rest = result
+        else:
+            body, rest = result, []
+        if hasattr(body, 'headers'):
+            body.headers['X-Profile-Id'] = trace_id
+        return (body, *rest) if rest else body
+    return wrapper
+
+
+def _save(profiler, trace_dir, elapsed_ms):
+    profiler.dump_stats(os.path.join(trace_dir, 'python.prof'))
+    out = io.StringIO()
+    out.write(f"{request.method} {request.path} took {elapsed_ms:.1f} ms\n\n")
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(30)
+    with open(os.path.join(trace_dir, 'summary.txt'), 'w') as f:
+        f.write(out.getvalue())
+
+
+@contextmanager
+def tf_trace():
+    """Capture a TensorFlow profiler trace around the block when the request asked for it."""
+    trace_dir = getattr(g, 'profile_trace_dir', None)
+    if not trace_dir or not getattr(g, 'profile_tf', False):
+        yield
+        return
+    import tensorflow as tf
+    tf.profiler.experimental.start(os.path.join(trace_dir, 'tf'))
+    try:
+        yield
+    finally:
+        tf.profiler.experimental.stop()
+
+
+# ---- Admin endpoints ---------------------------------------------------------
+def list_traces():
+    if not admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 401
+    traces = []
+    if os.path.isdir(PROFILE_DIR):
+        for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+            path = os.path.join(PROFILE_DIR, name)
+            if not os.path.isdir(path):
+                continue
+            summary = ''
+            summary_path = os.path.join(path, 'summary.txt')
+            if os.path.exists(summary_path):
+                with open(summary_path) as f:
+                    summary = f.readline().strip()
+            traces.append({
+                'id': name,
+                'summary': summary,
+                'has_tf_trace': os.path.isdir(os.path.join(path, 'tf')),
+            })
+    return jsonify({'traces': traces, 'sample_rate': PROFILE_SAMPLE_RATE, 'keep': PROFILE_KEEP})
+
+
+def download_trace(trace_id):
+    if not admin_authorized():
+        return jsonify({'error': 'Unauthorized'}), 401
+    path = os.path.join(PROFILE_DIR, os.path.basename(trace_id))
+    if not os.path.isdir(path):
+        return jsonify({'error': 'Trace not found'}), 404
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for root, _, files in os.walk(path):
+            for name in files:
+                full = os.path.join(root, name)
+                archive.write(full, os.path.relpath(full, path))
+    buffer.seek(0)
+    return send_file(buffer, mimetype='application/zip', as_attachment=True,
+                     download_name=f'{os.path.basename(path)}.zip')
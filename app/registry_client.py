@@ -0,0 +1,158 @@
+"""
+Shared MLflow metadata client for the app, the Airflow DAG and scripts.
+
+- One process-wide MlflowClient, so MLflow's pooled HTTP session is reused
+  instead of opening new connections per call/task
+- Bounded queries (max_results) instead of materialising every run
+- Retry with exponential backoff for transient tracking-server errors
+- TTL cache for run / model-version resolution
+"""
+import os
+import time
+import random
+import threading
+
+import mlflow
+from mlflow.tracking import MlflowClient
+
+DEFAULT_TTL_SECONDS = float(os.getenv('REGISTRY_CACHE_TTL_SECONDS', '60'))
+DEFAULT_MAX_RESULTS = int(os.getenv('REGISTRY_MAX_RESULTS', '100'))
+DEFAULT_RETRIES = int(os.getenv('REGISTRY_MAX_RETRIES', '3'))
+DEFAULT_BACKOFF_SECONDS = float(os.getenv('REGISTRY_BACKOFF_SECONDS', '0.5'))
+
+
+class TTLCache:
+    """Tiny thread-safe TTL cache keyed by tuples."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if time.monotonic() >= expires:
+                del self._data[key]
+                return None
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RegistryClient:
+    """Cached, retrying wrapper around MlflowClient for run/version lookups."""
+
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS, max_results=DEFAULT_MAX_RESULTS,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF_SECONDS):
+        self.client = MlflowClient()
+        self.cache = TTLCache(ttl)
+        self.max_results = max_results
+        self.retries = retries
+        self.backoff = backoff
+
+    def _call(self, fn, *args, **kwargs):
+        """Run `fn` with exponential backoff + jitter on failure."""
+        for attempt in range(self.retries + 1):
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+                print(f"DEBUG: registry call {getattr(fn, '__name__', fn)} failed ({e}); retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+    def _cached(self, key, fn, *args, **kwargs):
+        value = self.cache.get(key)
+        if value is None:
+            value = self._call(fn, *args, **kwargs)
+            self.cache.put(key, value)
+        return value
+
+    # ---- Runs --------------------------------------------------------------------
+    def latest_run_id(self, experiment_ids=None):
+        """Most recently started run id, fetching a single row from the server."""
+        def fetch():
+            runs = mlflow.search_runs(
+                experiment_ids=experiment_ids,
+                order_by=["attributes.start_time DESC"],
+                max_results=1,
+                output_format='list',
+            )
+            if not runs:
+                raise Exception("No runs found in MLFlow")
+            return runs[0].info.run_id
+        key = ('latest_run_id', tuple(experiment_ids or ()))
+        return self._cached(key, fetch)
+
+    # ---- Model registry -----------------------------------------------------------
+    def model_versions(self, name):
+        """Newest versions of a registered model first (bounded by max_results)."""
+        key = ('model_versions', name)
+        return self._cached(key, self.client.search_model_versions,
+                            f"name='{name}'", max_results=self.max_results,
+                            order_by=["version_number DESC"])
+
+    def latest_versions(self, name, stages):
+        key = ('latest_versions', name, tuple(stages))
+        return self._cached(key, self.client.get_latest_versions, name, stages=list(stages))
+
+    def latest_version_number(self, name):
+        versions = self.model_versions(name)
+        if not versions:
+            return None
+        return max(int(v.version) for v in versions)
+
+    def stage_version(self, name, stage):
+        """The ModelVersion currently in `stage`, or None."""
+        versions = self.latest_versions(name, [stage])
+        return versions[0] if versions else None
+
+    def transition_stage(self, name, version, stage, archive_existing_versions=True):
+        """Transition a version and drop cached lookups that it invalidates."""
+        result = self._call(self.client.transition_model_version_stage,
+                            name=name, version=version, stage=stage,
+                            archive_existing_versions=archive_existing_versions)
+        self.cache.clear()
+        return result
+
+    def search_registered_models(self):
+        return self._call(self.client.search_registered_models, max_results=self.max_results)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide RegistryClient (created on first use, after the tracking URI is set)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = RegistryClient()
+        return _client
+
+
+def configure(tracking_uri, username=None, password=None):
+    """Set MLflow credentials and tracking URI once per process; returns the shared client."""
+    global _client
+    if username:
+        os.environ['MLFLOW_TRACKING_USERNAME'] = username
+    if password:
+        os.environ['MLFLOW_TRACKING_PASSWORD'] = password
+    tracking_uri = (tracking_uri or '').strip()
+    if tracking_uri and tracking_uri != mlflow.get_tracking_uri():
+        mlflow.set_tracking_uri(tracking_uri)
+        with _client_lock:
+            _client = None  # a client is bound to the URI it was created with
+    return get_client()
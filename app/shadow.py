@@ -0,0 +1,138 @@
+"""
+Asynchronous shadow evaluation of a candidate model.
+
+A configurable fraction of /predict inputs is copied onto a bounded queue and
+scored by a candidate `cricket_shot_detector` version in a background thread.
+The user-facing response never waits on the candidate; when the queue is full
+the shadow sample is dropped instead.
+
+Config (environment):
+    SHADOW_MODEL_VERSION   registry version or stage to shadow, e.g. "4" or "Staging" (unset = off)
+    SHADOW_SAMPLE_RATE     fraction of requests copied to the shadow queue (default 0.1)
+    SHADOW_QUEUE_SIZE      max queued samples before dropping (default 64)
+"""
+import os
+import time
+import queue
+import random
+import threading
+from collections import deque
+
+import numpy as np
+
+import preprocessing
+
+MODEL_NAME = os.getenv('MODEL_NAME', 'cricket_shot_detector')
+SHADOW_MODEL_VERSION = os.getenv('SHADOW_MODEL_VERSION', '')
+SHADOW_SAMPLE_RATE = float(os.getenv('SHADOW_SAMPLE_RATE', '0.1'))
+SHADOW_QUEUE_SIZE = int(os.getenv('SHADOW_QUEUE_SIZE', '64'))
+LATENCY_WINDOW = 1000
+
+
+def load_candidate(version):
+    import mlflow
+    model_uri = f"models:/{MODEL_NAME}/{version}"
+    print(f"DEBUG: shadow: loading candidate model {model_uri}", flush=True)
+    return mlflow.keras.load_model(model_uri)
+
+
+class ShadowEvaluator:
+    """Scores sampled production inputs with a candidate model off the request path."""
+
+    def __init__(self, version=SHADOW_MODEL_VERSION, sample_rate=SHADOW_SAMPLE_RATE,
+                 queue_size=SHADOW_QUEUE_SIZE, loader=load_candidate):
+        self.version = version
+        self.sample_rate = sample_rate
+        self.loader = loader
+        self.candidate = None
+        self.load_error = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.counts = {'sampled': 0, 'dropped_queue_full': 0, 'scored': 0, 'agreed': 0, 'errors': 0}
+        self.confidence_delta_sum = 0.0
+        self.confidence_abs_delta_sum = 0.0
+        self.confusion = np.zeros((len(preprocessing.class_names),) * 2, dtype=np.int64)
+
+        if self.enabled:
+            threading.Thread(target=self._run, daemon=True, name='shadow-evaluator').start()
+
+    @property
+    def enabled(self):
+        return bool(self.version) and self.sample_rate > 0
+
+    # ---- Request path (must stay cheap) --------------------------------------
+    def submit(self, img_batch, production_probs):
+        """Maybe copy this request to the shadow queue; never blocks."""
+        if not self.enabled or self.candidate is None or random.random() >= self.sample_rate:
+            return False
+        try:
+            self._queue.put_nowait((img_batch, np.atleast_2d(production_probs)))
+        except queue.Full:
+            with self._lock:
+                self.counts['dropped_queue_full'] += 1
+            return False
+        with self._lock:
+            self.counts['sampled'] += 1
+        return True
+
+    # ---- Background worker -----------------------------------------------------
+    def _run(self):
+        try:
+            self.candidate = self.loader(self.version)
+            print(f"DEBUG: shadow: candidate version {self.version} ready", flush=True)
+        except Exception as e:
+            self.load_error = str(e)
+            print(f"DEBUG: shadow: failed to load candidate {self.version}: {e}", flush=True)
+            return
+        while True:
+            img_batch, production_probs = self._queue.get()
+            try:
+                started = time.perf_counter()
+                candidate_probs = np.atleast_2d(self.candidate.predict(img_batch, verbose=0))
+                latency_ms = (time.perf_counter() - started) * 1000
+                self._record(production_probs, candidate_probs, latency_ms)
+            except Exception as e:
+                with self._lock:
+                    self.counts['errors'] += 1
+                print(f"DEBUG: shadow: candidate scoring failed: {e}", flush=True)
+
+    def _record(self, production_probs, candidate_probs, latency_ms):
+        prod_idx = production_probs.argmax(axis=1)
+        cand_idx = candidate_probs.argmax(axis=1)
+        rows = np.arange(len(prod_idx))
+        # Delta of the candidate's confidence in the class production chose
+        deltas = candidate_probs[rows, prod_idx] - production_probs[rows, prod_idx]
+        with self._lock:
+            self.counts['scored'] += len(prod_idx)
+            self.counts['agreed'] += int((prod_idx == cand_idx).sum())
+            self.confidence_delta_sum += float(deltas.sum())
+            self.confidence_abs_delta_sum += float(np.abs(deltas).sum())
+            np.add.at(self.confusion, (prod_idx, cand_idx), 1)
+            self._latencies.append(latency_ms)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+            scored = counts['scored']
+            latencies = sorted(self._latencies)
+            confusion = self.confusion.tolist()
+            delta_sum, abs_delta_sum = self.confidence_delta_sum, self.confidence_abs_delta_sum
+
+        def pct(q):
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 1) if latencies else None
+
+        return {
+            'enabled': self.enabled,
+            'candidate_version': self.version or None,
+            'candidate_loaded': self.candidate is not None,
+            'load_error': self.load_error,
+            'sample_rate': self.sample_rate,
+            'queue_depth': self._queue.qsize(),
+            **counts,
+            'agreement_rate': round(counts['agreed'] / scored, 4) if scored else None,
+            'mean_confidence_delta': round(delta_sum / scored * 100, 2) if scored else None,
+            'mean_abs_confidence_delta': round(abs_delta_sum / scored * 100, 2) if scored else None,
+            'candidate_latency_ms': {'p50': pct(0.5), 'p95': pct(0.95), 'p99': pct(0.99)},
+            'confusion': {'labels': preprocessing.class_names, 'production_by_candidate': confusion},
+        }
@@ -0,0 +1,87 @@
+"""
+Benchmark /predict (multipart JPEG) against /predict/raw (uint8 tensors)
+on a running app. Usage: python benchmark_raw_predict.py [URL] [REQUESTS]
+
+Start the app with ADMISSION_RATE_PER_SEC=0 for clean numbers: with the
+default per-client rate limit, back-to-back requests are shed (429/503).
+Shed requests are not timed; the benchmark waits out Retry-After, retries,
+and reports how many were shed per path.
+"""
+import io
+import sys
+import time
+import statistics
+
+import numpy as np
+import requests
+from PIL import Image
+
+base_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:5000"
+n_requests = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+# Synthetic 224x224 frames, the same pixels for both paths
+rng = np.random.default_rng(0)
+frames = rng.integers(0, 256, size=(8, 224, 224, 3), dtype=np.uint8)
+
+session = requests.Session()
+
+
+MAX_SHED_RETRIES = 20
+
+
+def time_calls(fn):
+    """Latencies of n successful calls, plus how many attempts were shed by admission control."""
+    latencies = []
+    shed = 0
+    while len(latencies) < n_requests:
+        start = time.perf_counter()
+        response = fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code in (429, 503):
+            shed += 1
+            if shed > MAX_SHED_RETRIES * n_requests:
+                raise Exception(f"Gave up after {shed} shed requests; start the app with ADMISSION_RATE_PER_SEC=0")
+            time.sleep(float(response.headers.get('Retry-After', 1)))
+            continue
+        if response.status_code != 200:
+            raise Exception(f"{response.status_code}: {response.text[:200]}")
+        latencies.append(elapsed)
+    return latencies, shed
+
+
+def jpeg_single():
+    buf = io.BytesIO()
+    Image.fromarray(frames[0]).save(buf, format='JPEG', quality=90)  # client-side encode is part of the cost
+    buf.seek(0)
+    return session.post(f"{base_url}/predict", files={'file': ('frame.jpg', buf, 'image/jpeg')}, timeout=30)
+
+
+def raw_single():
+    return session.post(f"{base_url}/predict/raw", data=frames[0].tobytes(),
+                        headers={'Content-Type': 'application/octet-stream'}, timeout=30)
+
+
+def npy_batch():
+    buf = io.BytesIO()
+    np.save(buf, frames)
+    return session.post(f"{base_url}/predict/raw", data=buf.getvalue(),
+                        headers={'Content-Type': 'application/x-npy', 'Accept': 'application/octet-stream'},
+                        timeout=30)
+
+
+print("=" * 60)
+print(f"⏱️  Benchmarking {base_url} with {n_requests} requests per path")
+print("=" * 60)
+
+for name, fn, images in [
+    ("multipart JPEG /predict (1 image)", jpeg_single, 1),
+    ("raw uint8 /predict/raw (1 image)", raw_single, 1),
+    (f"npy batch /predict/raw ({len(frames)} images)", npy_batch, len(frames)),
+]:
+    fn()  # warm up
+    latencies, shed = time_calls(fn)
+    p50 = statistics.median(latencies)
+    p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1]
+    throughput = images * len(latencies) / (sum(latencies) / 1000)
+    shed_note = f"  ({shed} shed by rate limit, retried)" if shed else ""
+    print(f"{name:45s} p50 {p50:7.1f} ms  p95 {p95:7.1f} ms  {throughput:7.1f} img/s{shed_note}")
@@ -0,0 +1,314 @@
+"""
+Micro-benchmark suite with historical regression tracking.
+
+Runs fully offline against a locally built stand-in model with the same
+input/output contract as cricket_shot_detector (224x224x3 uint8 -> 4-way
+softmax), so no MLflow/DagsHub access is needed.
+
+Benchmarks:
+    decode_resize_jpeg     JPEG bytes -> 224x224 RGB (PIL, reduced-resolution decode)
+    preprocess_to_tensor   PIL image -> uint8 batch tensor
+    inference_bs{N}        model.predict at batch sizes 1..64 (ms per batch + img/s)
+    predict_endpoint       POST /predict end to end via the Flask test client
+    model_load             tf.keras.models.load_model of the saved stand-in
+
+--compare-cpu-modes runs the inference and endpoint benchmarks in three fresh
+processes - Keras predict() (INFERENCE_MODE=default), a direct tf.function
+(INFERENCE_MODE=optimized INFERENCE_XLA=0) and the same with XLA - and prints
+them side by side (see app/cpu_inference.py). --model-path
+benchmarks a saved Keras model instead of the stand-in.
+
+Each run is appended to a JSON-lines history file. A metric fails when its
+median is more than --threshold slower than the median of the last
+--baseline-runs runs recorded with the same CPU model, CPU count, Python and
+TF version (or the same --env-key).
+
+Usage:
+    python benchmark_suite.py [--standin mobilenet|tiny] [--repeat 20]
+        [--threshold 0.2] [--history benchmark_history.jsonl] [--no-save] [--only inference]
+    python benchmark_suite.py --compare-cpu-modes [--standin tiny] [--model-path model.keras]
+"""
+import io
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+import numpy as np
+from PIL import Image
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app')
+sys.path.insert(0, APP_DIR)
+import preprocessing  # noqa: E402
+import cpu_inference  # noqa: E402  (sets oneDNN/thread env vars before TensorFlow loads)
+
+BATCH_SIZES = (1, 4, 16, 32, 64)
+
+
+def build_standin_model(kind):
+    """Untrained model with the production input/output contract (no weight downloads)."""
+    import tensorflow as tf
+    inputs = tf.keras.Input(shape=preprocessing.FRAME_SHAPE)
+    x = tf.keras.layers.Rescaling(1.0 / 127.5, offset=-1)(inputs)
+    if kind == 'mobilenet':
+        backbone = tf.keras.applications.MobileNetV2(input_shape=preprocessing.FRAME_SHAPE,
+                                                     include_top=False, weights=None, pooling='avg')
+        x = backbone(x)
+    else:
+        for filters in (16, 32, 64):
+            x = tf.keras.layers.Conv2D(filters, 3, strides=2, activation='relu')(x)
+        x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    x = tf.keras.layers.Dense(128, activation='relu')(x)
+    outputs = tf.keras.layers.Dense(len(preprocessing.class_names), activation='softmax')(x)
+    return tf.keras.Model(inputs, outputs, name=f'standin_{kind}')
+
+
+def measure(fn, repeat, warmup=2):
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(sorted(timings)[max(0, int(len(timings) * 0.95) - 1)], 3),
+        'runs': len(timings),
+    }
+
+
+def sample_jpeg(size=(1280, 720)):
+    rng = np.random.default_rng(0)
+    # Smooth gradient + noise compresses like a photo rather than pure noise
+    gradient = np.linspace(0, 255, size[0], dtype=np.float32)[None, :, None]
+    pixels = np.clip(gradient + rng.normal(0, 20, (size[1], size[0], 3)), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format='JPEG', quality=90)
+    return buf.getvalue()
+
+
+def run_suite(args):
+    import tensorflow as tf
+    cpu_inference.configure_threads()
+
+    results = {}
+    selected = lambda name: not args.only or any(name.startswith(o) for o in args.only)  # noqa: E731
+    jpeg = sample_jpeg()
+
+    if selected('decode_resize_jpeg'):
+        results['decode_resize_jpeg'] = measure(lambda: preprocessing.preprocess(jpeg), args.repeat)
+
+    if selected('preprocess_to_tensor'):
+        img = preprocessing.load_rgb(jpeg)
+        results['preprocess_to_tensor'] = measure(
+            lambda: np.expand_dims(preprocessing.to_array(img), axis=0), args.repeat)
+
+    workdir = tempfile.mkdtemp(prefix='cricket-bench-')
+    if args.model_path:
+        model_path = args.model_path
+        model = tf.keras.models.load_model(model_path)
+    else:
+        model = build_standin_model(args.standin)
+        model_path = os.path.join(workdir, 'standin.keras')
+        model.save(model_path)
+    # No-op unless INFERENCE_MODE=optimized; warmup compiles every batch bucket up front
+    model = cpu_inference.optimize(model)
+
+    if selected('model_load'):
+        results['model_load'] = measure(lambda: tf.keras.models.load_model(model_path),
+                                        max(3, args.repeat // 5), warmup=1)
+
+    rng = np.random.default_rng(1)
+    for bs in BATCH_SIZES:
+        name = f'inference_bs{bs}'
+        if not selected(name):
+            continue
+        batch = rng.integers(0, 256, size=(bs,) + preprocessing.FRAME_SHAPE, dtype=np.uint8)
+        stats = measure(lambda: model.predict(batch, verbose=0), args.repeat)
+        stats['images_per_s'] = round(bs / (stats['median_ms'] / 1000), 1)
+        results[name] = stats
+
+    if selected('predict_endpoint'):
+        # Import the real app wired to the stand-in model and temp dirs
+        os.environ['LOCAL_MODEL_PATH'] = model_path
+        for var, sub in (('UPLOAD_FOLDER', 'uploads'), ('JOBS_DIR', 'jobs'), ('MONITORING_SNAPSHOT_DIR', 'monitoring'),
+                         ('PROFILE_DIR', 'profiles'), ('EMBEDDING_INDEX_DIR', 'embeddings')):
+            os.environ.setdefault(var, os.path.join(workdir, sub))
+        os.environ.setdefault('ADMISSION_RATE_PER_SEC', '0')
+        cwd = os.getcwd()
+        os.chdir(APP_DIR)
+        try:
+            import app as cricket_app
+        finally:
+            os.chdir(cwd)
+        client = cricket_app.app.test_client()
+
+        def post():
+            response = client.post('/predict', data={'file': (io.BytesIO(jpeg), 'bench.jpg')},
+                                   content_type='multipart/form-data')
+            if response.status_code != 200:
+                raise RuntimeError(f"/predict returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+        results['predict_endpoint'] = measure(post, args.repeat)
+
+    return results
+
+
+def cpu_model():
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def environment_key(override=None):
+    """Hardware/software key for comparable runs (no hostname: it changes per container/CI job)."""
+    if override:
+        return override
+    import tensorflow as tf
+    return (f"{cpu_model()}|{platform.machine()}|cpus={cpu_inference.available_cpus()}"
+            f"|py={platform.python_version()}|tf={tf.__version__}")
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def check_regressions(results, history, env, standin, threshold, baseline_runs, mode='default'):
+    """Compare medians with the median of the last N comparable runs."""
+    comparable = [h for h in history if h.get('environment') == env and h.get('standin') == standin
+                  and h.get('inference_mode', 'default') == mode]
+    comparable = comparable[-baseline_runs:]
+    report = []
+    for name, stats in results.items():
+        previous = [h['results'][name]['median_ms'] for h in comparable if name in h.get('results', {})]
+        if not previous:
+            report.append((name, stats['median_ms'], None, None, False))
+            continue
+        baseline = statistics.median(previous)
+        change = (stats['median_ms'] - baseline) / baseline if baseline else 0.0
+        report.append((name, stats['median_ms'], baseline, change, change > threshold))
+    return report
+
+
+# (label, environment) per column: Keras predict(), a plain tf.function, the same tf.function with XLA.
+# The last two share thread settings, so their difference is what XLA itself contributes.
+CPU_MODES = (
+    ('default', {'INFERENCE_MODE': 'default'}),
+    ('tf.function', {'INFERENCE_MODE': 'optimized', 'INFERENCE_XLA': '0'}),
+    ('xla', {'INFERENCE_MODE': 'optimized', 'INFERENCE_XLA': '1'}),
+)
+
+
+def compare_cpu_modes(args):
+    """Run the inference benchmarks in one fresh process per CPU mode and print them side by side."""
+    workdir = tempfile.mkdtemp(prefix='cricket-bench-compare-')
+    model_path = args.model_path
+    if not model_path:
+        # Build the stand-in once in a child so every mode scores identical weights
+        model_path = os.path.join(workdir, 'standin.keras')
+        subprocess.run([sys.executable, '-c',
+                        f"import sys; sys.argv = ['x']; import benchmark_suite as b; "
+                        f"b.build_standin_model({args.standin!r}).save({model_path!r})"],
+                       cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+
+    mode_results = {}
+    for label, env in CPU_MODES:
+        out = os.path.join(workdir, f"{label.replace('.', '_')}.json")
+        cmd = [sys.executable, os.path.abspath(__file__), '--no-save', '--repeat', str(args.repeat),
+               '--model-path', model_path, '--json-out', out,
+               '--only', *(args.only or ['inference', 'predict_endpoint'])]
+        print(f"\n▶️  {label}: {' '.join(f'{k}={v}' for k, v in env.items())}")
+        subprocess.run(cmd, env={**os.environ, **env}, check=True)
+        with open(out) as f:
+            mode_results[label] = json.load(f)
+
+    default, function, xla = (mode_results[label] for label, _ in CPU_MODES)
+    print("\n" + "=" * 86)
+    print("median ms per call; 'xla gain' is tf.function vs tf.function+XLA (same threads, no predict() overhead)")
+    print(f"{'benchmark':22s} {'default':>9s} {'tf.function':>12s} {'xla':>9s} {'xla gain':>9s} {'img/s (default/fn/xla)':>22s}")
+    print("=" * 86)
+    for name in default:
+        if name not in function or name not in xla:
+            continue
+        ms = [results[name]['median_ms'] for results in (default, function, xla)]
+        throughput = ""
+        if 'images_per_s' in default[name]:
+            throughput = "/".join(f"{results[name]['images_per_s']:.0f}" for results in (default, function, xla))
+        gain = ms[1] / ms[2] if ms[2] else 0
+        print(f"{name:22s} {ms[0]:9.2f} {ms[1]:12.2f} {ms[2]:9.2f} {gain:8.2f}x {throughput:>22s}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cricket shot detection micro-benchmarks")
+    parser.add_argument('--standin', choices=['mobilenet', 'tiny'], default='mobilenet')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown vs baseline (0.2 = 20%%)")
+    parser.add_argument('--baseline-runs', type=int, default=5)
+    parser.add_argument('--history', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                          'benchmark_history.jsonl'))
+    parser.add_argument('--no-save', action='store_true', help="Don't append this run to the history")
+    parser.add_argument('--only', nargs='*', help="Run only benchmarks whose name starts with these prefixes")
+    parser.add_argument('--model-path', help="Benchmark this saved Keras model instead of the stand-in")
+    parser.add_argument('--json-out', help="Also write this run's results to a JSON file")
+    parser.add_argument('--env-key', help="Explicit baseline key (e.g. a CI runner class) instead of CPU/Python/TF")
+    parser.add_argument('--compare-cpu-modes', action='store_true',
+                        help="Compare Keras predict() vs tf.function vs tf.function+XLA side by side")
+    args = parser.parse_args(argv)
+
+    if args.compare_cpu_modes:
+        return compare_cpu_modes(args)
+
+    print("=" * 70)
+    print(f"⏱️  Running benchmarks (model: {args.model_path or 'stand-in ' + args.standin}, "
+          f"mode: {cpu_inference.mode_label()}, repeat: {args.repeat})")
+    print("=" * 70)
+    results = run_suite(args)
+    if args.json_out:
+        with open(args.json_out, 'w') as f:
+            json.dump(results, f, indent=2)
+    env = environment_key(args.env_key)
+    history = load_history(args.history)
+    report = check_regressions(results, history, env, args.model_path or args.standin, args.threshold,
+                               args.baseline_runs, cpu_inference.mode_label())
+
+    regressions = 0
+    for name, median, baseline, change, regressed in report:
+        extra = f"  {results[name]['images_per_s']:8.1f} img/s" if 'images_per_s' in results[name] else ""
+        if baseline is None:
+            print(f"🆕 {name:24s} {median:9.2f} ms  (no baseline){extra}")
+        else:
+            flag = "❌" if regressed else "✅"
+            print(f"{flag} {name:24s} {median:9.2f} ms  baseline {baseline:9.2f} ms  {change:+7.1%}{extra}")
+        regressions += regressed
+
+    if not args.no_save:
+        entry = {'timestamp': time.time(), 'environment': env, 'standin': args.model_path or args.standin,
+                 'inference_mode': cpu_inference.mode_label(), 'results': results}
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+        print(f"\n💾 Results appended to {args.history}")
+
+    if regressions:
+        print(f"\n❌ {regressions} metric(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,8 +2,11 @@
 Script to transition cricket_shot_detector model to Production stage
 """
 import os
-import mlflow
-from mlflow.tracking import MlflowClient
+import sys
+
+# Shared registry client lives with the Flask app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+import registry_client  # noqa: E402
 
 # Configuration from your DagsHub
 MLFLOW_TRACKING_URI = "https://dagshub.com/MuzammilAhmedBhatti/cricket-shot-detection.mlflow"
@@ -16,21 +19,16 @@ print("🏏 Transitioning Cricket Shot Detector Model to Production")
 print("="*70)
 
 # Set up MLFlow authentication
-os.environ['MLFLOW_TRACKING_USERNAME'] = DAGSHUB_USERNAME
-os.environ['MLFLOW_TRACKING_PASSWORD'] = DAGSHUB_TOKEN
-mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
+client = registry_client.configure(MLFLOW_TRACKING_URI, DAGSHUB_USERNAME, DAGSHUB_TOKEN)
 
 print(f"\n📊 MLFlow Tracking URI: {MLFLOW_TRACKING_URI}")
 print(f"👤 Username: {DAGSHUB_USERNAME}")
 print(f"🤖 Model Name: {MODEL_NAME}\n")
 
 try:
-    # Create MLFlow client
-    client = MlflowClient()
-    
     # Get all versions of the model
     print(f"🔍 Fetching all versions of '{MODEL_NAME}'...")
-    all_versions = client.search_model_versions(f"name='{MODEL_NAME}'")
+    all_versions = client.model_versions(MODEL_NAME)
     
     if not all_versions:
         print(f"❌ ERROR: No model found with name '{MODEL_NAME}'")
@@ -47,12 +45,12 @@ try:
         print(f"   Version {version.version}: Stage = {version.current_stage}, Status = {version.status}")
     
     # Get the latest version
-    latest_version = max([int(v.version) for v in all_versions])
+    latest_version = client.latest_version_number(MODEL_NAME)
     print(f"\n🎯 Latest version: {latest_version}")
     
     # Transition to Production
     print(f"\n⚡ Transitioning version {latest_version} to Production...")
-    client.transition_model_version_stage(
+    client.transition_stage(
         name=MODEL_NAME,
         version=latest_version,
         stage="Production",
@@ -64,9 +62,9 @@ try:
     
     # Verify
     print(f"\n🔍 Verifying...")
-    prod_versions = client.get_latest_versions(MODEL_NAME, stages=["Production"])
-    if prod_versions:
-        print(f"✅ Confirmed: Version {prod_versions[0].version} is in Production")
+    prod_version = client.stage_version(MODEL_NAME, "Production")
+    if prod_version:
+        print(f"✅ Confirmed: Version {prod_version.version} is in Production")
     
     print("\n" + "="*70)
     print("✅ DONE! You can now restart your Flask app:")